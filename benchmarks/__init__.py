@@ -0,0 +1 @@
+"""Benchmark offline per l'integrazione SMS Gammu Gateway."""
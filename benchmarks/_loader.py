@@ -0,0 +1,22 @@
+"""Caricamento dei moduli del componente senza eseguire il suo __init__.
+
+Il pacchetto custom_components.gammu_gateway importa Home Assistant al
+caricamento; i moduli che non ne dipendono (api, const, ...) possono essere
+misurati anche senza Home Assistant installato.
+"""
+import importlib
+import sys
+import types
+from pathlib import Path
+
+COMPONENT_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "gammu_gateway"
+PACKAGE = "gammu_gateway"
+
+
+def load(module_name):
+    """Importa custom_components/gammu_gateway/<module_name>.py."""
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [str(COMPONENT_DIR)]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{module_name}")
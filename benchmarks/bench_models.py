@@ -0,0 +1,97 @@
+"""Decodifica delle risposte del gateway: dizionari grezzi contro modelli compatti.
+
+Uso:
+    python -m benchmarks.bench_models [--messages N] [--rounds R]
+
+Il percorso "legacy" riproduce il vecchio parsing (json.loads e, per ogni
+SMS, un dizionario con le chiavi alternative Number/Sender, Date/DateTime);
+il percorso "models" usa decode_json (orjson se installato) e i modelli
+con __slots__ di models.py. Misura il tempo per risposta /sms e /signal e
+la memoria occupata dai messaggi decodificati.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from ._loader import load
+
+
+def _legacy_parse_sms(sms_data):
+    """Copia del vecchio parse_sms, usata come riferimento."""
+    return {
+        "sender": sms_data.get("Number") or sms_data.get("Sender") or "Unknown",
+        "text": sms_data.get("Text"),
+        "date": sms_data.get("Date") or sms_data.get("DateTime"),
+        "state": sms_data.get("State"),
+    }
+
+
+def _payloads(messages):
+    inbox = [
+        {
+            "Number": f"+3912345{index:05d}",
+            "Text": f"Messaggio di prova numero {index}",
+            "Date": "2024-01-01 12:00:00",
+            "State": "UnRead",
+            "Location": index,
+            "UDH": {"ID8bit": -1, "ID16bit": -1, "PartNumber": -1, "AllParts": 0},
+        }
+        for index in range(messages)
+    ]
+    signal = {"SignalStrength": -71, "SignalPercent": 58, "BitErrorRate": -1}
+    return json.dumps(inbox).encode(), json.dumps(signal).encode()
+
+
+def _timed(func, body, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(body)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def _retained(func, body):
+    tracemalloc.start()
+    result = func(body)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main(messages, rounds):
+    models = load("models")
+    inbox, signal = _payloads(messages)
+
+    def legacy_inbox(body):
+        return [_legacy_parse_sms(sms) for sms in json.loads(body)]
+
+    def models_inbox(body):
+        return models.SmsMessage.list_from_response(models.decode_json(body))
+
+    def legacy_signal(body):
+        return json.loads(body).get("SignalStrength")
+
+    def models_signal(body):
+        return models.SignalInfo.from_response(models.decode_json(body)).strength
+
+    print(f"messages={messages} rounds={rounds} backend={models.JSON_BACKEND}")
+    for name, legacy, compact, body in (
+        ("/sms", legacy_inbox, models_inbox, inbox),
+        ("/signal", legacy_signal, models_signal, signal),
+    ):
+        legacy_us = _timed(legacy, body, rounds)
+        models_us = _timed(compact, body, rounds)
+        print(f"{name:8} legacy : {legacy_us:9.1f} us   models : {models_us:9.1f} us ({legacy_us / models_us:.2f}x)")
+
+    legacy_bytes = _retained(legacy_inbox, inbox)
+    models_bytes = _retained(models_inbox, inbox)
+    print(f"/sms     memory : legacy {legacy_bytes / 1024:.0f} KiB, models {models_bytes / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+    main(args.messages, args.rounds)
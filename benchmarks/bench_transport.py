@@ -0,0 +1,111 @@
+"""Richieste al secondo del trasporto HTTP, prima e dopo il pool dedicato.
+
+Uso:
+    python -m benchmarks.bench_transport [--requests N] [--concurrency C] [--latency S] [--rounds R]
+
+Il client "legacy" riproduce il vecchio _api_wrapper (BasicAuth creato ad
+ogni chiamata, risposta non gestita con context manager, sessione condivisa);
+il client "pooled" è GammuGatewayApiClient con il suo trasporto dedicato
+(chiamato sotto lo scheduler del modem, che serializzerebbe le richieste).
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+import aiohttp
+import async_timeout
+
+from ._loader import load
+from .mock_gateway import serve_forever
+
+
+class LegacyClient:
+    """Copia del trasporto originale, usata come riferimento."""
+
+    def __init__(self, host, port, username, password, session):
+        self._username = username
+        self._password = password
+        self._session = session
+        self._base_url = f"http://{host}:{port}"
+
+    async def get_signal(self):
+        auth = aiohttp.BasicAuth(self._username, self._password)
+        async with async_timeout.timeout(10):
+            response = await self._session.get(f"{self._base_url}/signal", auth=auth)
+            if response.status != 200:
+                raise Exception(f"Errore API ({response.status})")
+            return await response.json()
+
+
+class _Transport:
+    """Chiama il trasporto del client senza passare dallo scheduler del modem."""
+
+    def __init__(self, client):
+        self._client = client
+
+    async def get_signal(self):
+        return await self._client._api_wrapper("GET", "signal")
+
+
+async def _run(client, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await client.get_signal()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def _bench_legacy(port, total, concurrency):
+    async with aiohttp.ClientSession() as shared:
+        legacy = LegacyClient("127.0.0.1", port, "admin", "password", shared)
+        await _run(legacy, concurrency, concurrency)
+        return await _run(legacy, total, concurrency)
+
+
+async def _bench_pooled(api, port, total, concurrency):
+    pooled = api.GammuGatewayApiClient("127.0.0.1", port, "admin", "password")
+    try:
+        transport = _Transport(pooled)
+        await _run(transport, concurrency, concurrency)
+        return await _run(transport, total, concurrency)
+    finally:
+        await pooled.async_close()
+
+
+async def main(port, total, concurrency, latency, rounds):
+    api = load("api")
+    legacy_rps = pooled_rps = 0.0
+    # Alterniamo i due client e teniamo il migliore di ogni serie
+    for _ in range(rounds):
+        legacy_rps = max(legacy_rps, await _bench_legacy(port, total, concurrency))
+        pooled_rps = max(pooled_rps, await _bench_pooled(api, port, total, concurrency))
+
+    print(f"requests={total} concurrency={concurrency} latency={latency}s rounds={rounds}")
+    print(f"legacy : {legacy_rps:8.1f} req/s")
+    print(f"pooled : {pooled_rps:8.1f} req/s ({pooled_rps / legacy_rps:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    # Il gateway gira in un processo separato per non competere con il client
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve_forever, args=(port_queue,), kwargs={"latency": args.latency}, daemon=True
+    )
+    server.start()
+    try:
+        port = port_queue.get(timeout=10)
+        asyncio.run(main(port, args.requests, args.concurrency, args.latency, args.rounds))
+    finally:
+        server.terminate()
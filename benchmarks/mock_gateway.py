@@ -0,0 +1,203 @@
+"""Server locale che simula l'API REST di sms-gammu-gateway.
+
+Uso come server autonomo:
+    python -m benchmarks.mock_gateway --port 5000 --latency 0.05 --error-rate 0.05 --queue 200
+
+Oltre alle rotte del gateway (/signal, /network, /sms, /getsms, /reset)
+espone POST /_bench/push?count=N per iniettare SMS in coda durante un
+benchmark; ogni SMS iniettato porta in fondo al testo ("@<time.time()>")
+l'istante di inserimento, per misurare la latenza end-to-end.
+"""
+import argparse
+import asyncio
+import base64
+import random
+import time
+
+from aiohttp import web
+
+
+class MockGateway:
+    """Gateway finto con latenza, errori e profondità di coda configurabili."""
+
+    def __init__(
+        self,
+        username="admin",
+        password="password",
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        auth_failure_rate=0.0,
+        queue=0,
+        serialize=False,
+        seed=None,
+    ):
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.auth_failure_rate = auth_failure_rate
+        # Gammu usa una sola porta seriale: con serialize=True le richieste vengono servite una alla volta
+        self._modem_lock = asyncio.Lock() if serialize else None
+        self._random = random.Random(seed)
+        self.inbox = []
+        self.sent = []
+        self._next_location = 1
+        self.calls = 0
+        self.errors = 0
+        self._expected_auth = "Basic " + base64.b64encode(
+            f"{username}:{password}".encode()
+        ).decode()
+        self._runner = None
+        self.port = None
+        for index in range(queue):
+            self.push_sms("+390000000000", f"Messaggio in coda {index}")
+
+    def _app(self):
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/signal", self._signal)
+        app.router.add_get("/network", self._network)
+        app.router.add_get("/getsms", self._getsms)
+        app.router.add_get("/sms", self._list_sms)
+        app.router.add_post("/sms", self._send_sms)
+        app.router.add_get("/reset", self._reset)
+        app.router.add_post("/_bench/push", self._bench_push)
+        return app
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        if request.path.startswith("/_bench/"):
+            return await handler(request)
+
+        self.calls += 1
+        if request.headers.get("Authorization") != self._expected_auth:
+            return web.Response(status=401, text="Unauthorized")
+        if self.auth_failure_rate and self._random.random() < self.auth_failure_rate:
+            self.errors += 1
+            return web.Response(status=401, text="Unauthorized")
+
+        if self._modem_lock is None:
+            return await self._serve(request, handler)
+        async with self._modem_lock:
+            return await self._serve(request, handler)
+
+    async def _serve(self, request, handler):
+        delay = self.latency
+        if self.jitter:
+            delay = max(0.0, delay + self._random.uniform(-self.jitter, self.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=500, text="Modem error")
+        return await handler(request)
+
+    async def _signal(self, request):
+        return web.json_response({
+            "SignalStrength": -71 + self._random.randint(-2, 2),
+            "SignalPercent": 58,
+            "BitErrorRate": -1,
+        })
+
+    async def _network(self, request):
+        return web.json_response(
+            {"NetworkName": "Mock", "State": "HomeNetwork", "NetworkCode": "222 01"}
+        )
+
+    async def _getsms(self, request):
+        if not self.inbox:
+            return web.json_response({})
+        return web.json_response(self.inbox.pop(0))
+
+    async def _list_sms(self, request):
+        return web.json_response(list(self.inbox))
+
+    async def _send_sms(self, request):
+        self.sent.append(await request.json())
+        return web.json_response({"status": 200, "message": "[OK]"})
+
+    async def _reset(self, request):
+        return web.json_response({"status": 200, "message": "Reset done"})
+
+    async def _bench_push(self, request):
+        count = int(request.query.get("count", 1))
+        for _ in range(count):
+            self.push_sms("+391234567890", f"Benchmark {len(self.inbox)}")
+        return web.json_response({"queued": len(self.inbox)})
+
+    def push_sms(self, number, text):
+        """Mette un SMS nella coda letta da /getsms."""
+        self._next_location += 1
+        self.inbox.append({
+            "Number": number,
+            "Text": f"{text} @{time.time():.6f}",
+            "Date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "State": "UnRead",
+            "Location": self._next_location,
+        })
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Avvia il server e ritorna la porta effettiva."""
+        self._runner = web.AppRunner(self._app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def serve_forever(port_queue, **options):
+    """Avvia il gateway in un processo separato e comunica la porta."""
+
+    async def _main():
+        gateway = MockGateway(**options)
+        port_queue.put(await gateway.start())
+        await asyncio.Event().wait()
+
+    asyncio.run(_main())
+
+
+def add_arguments(parser):
+    """Opzioni del gateway finto, condivise con i benchmark."""
+    parser.add_argument("--latency", type=float, default=0.0, help="latenza per richiesta (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variazione casuale della latenza (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="frazione di risposte 500")
+    parser.add_argument("--auth-failure-rate", type=float, default=0.0, help="frazione di risposte 401")
+    parser.add_argument("--queue", type=int, default=0, help="SMS già in coda all'avvio")
+    parser.add_argument("--serialize", action="store_true", help="serve una richiesta alla volta come la porta seriale")
+
+
+def gateway_options(args):
+    return {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "auth_failure_rate": args.auth_failure_rate,
+        "queue": args.queue,
+        "serialize": args.serialize,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gateway sms-gammu-gateway finto")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    async def _main():
+        gateway = MockGateway(**gateway_options(args))
+        port = await gateway.start(args.host, args.port)
+        print(f"Mock gateway in ascolto su http://{args.host}:{port} (admin/password)")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,238 @@
+"""Suite di benchmark offline contro il gateway finto.
+
+Uso:
+    python -m benchmarks.suite [--scenario send receive coordinator] [--json risultati.json]
+                               [opzioni del gateway finto, vedi mock_gateway]
+
+Scenari:
+- send: throughput di GammuGatewayApiClient.send_sms (POST /sms);
+- receive: latenza end-to-end degli SMS iniettati nel gateway e letti dal
+  vero GammuSmsPoller (drain di /getsms e cadenza adattiva);
+- coordinator: tempo di aggiornamento di SmsGammuCoordinator con una
+  inbox /sms di almeno --inbox messaggi.
+
+Con --queue gli SMS già in coda vengono drenati dallo scenario receive e
+pesano sulla sua latenza (recupero di un arretrato).
+
+Per ogni scenario viene misurato anche il blocco dell'event loop (ritardo
+massimo e p99 di un timer da 10 ms). receive e coordinator richiedono
+Home Assistant installato; senza vengono saltati.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import statistics
+import time
+
+import aiohttp
+
+from ._loader import load
+from .mock_gateway import add_arguments, gateway_options, serve_forever
+
+LOOP_PROBE_INTERVAL = 0.01
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LoopMonitor:
+    """Misura di quanto l'event loop ritarda un timer periodico."""
+
+    def __init__(self):
+        self.lags = []
+        self._task = None
+
+    async def _probe(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LOOP_PROBE_INTERVAL)
+            self.lags.append(time.perf_counter() - start - LOOP_PROBE_INTERVAL)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+    def summary(self):
+        return {
+            "loop_lag_max_ms": round(max(self.lags, default=0) * 1000, 2),
+            "loop_lag_p99_ms": round((_percentile(self.lags, 0.99) or 0) * 1000, 2),
+        }
+
+
+async def bench_send(port, args):
+    api = load("api")
+    client = api.GammuGatewayApiClient("127.0.0.1", port, "admin", "password")
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(index):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await client.send_sms("+391234567890", f"Benchmark {index}")
+            except Exception:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    try:
+        with LoopMonitor() as monitor:
+            start = time.perf_counter()
+            await asyncio.gather(*(one(index) for index in range(args.messages)))
+            elapsed = time.perf_counter() - start
+    finally:
+        await client.async_close()
+
+    return {
+        "messages": args.messages,
+        "concurrency": args.concurrency,
+        "throughput_msg_s": round(len(latencies) / elapsed, 1),
+        "errors": errors,
+        "latency_p50_ms": round((_percentile(latencies, 0.5) or 0) * 1000, 2),
+        "latency_p95_ms": round((_percentile(latencies, 0.95) or 0) * 1000, 2),
+        **monitor.summary(),
+    }
+
+
+async def bench_receive(port, args):
+    api = load("api")
+    sms_poller = load("sms_poller")
+    client = api.GammuGatewayApiClient("127.0.0.1", port, "admin", "password")
+    latencies = []
+
+    async def on_sms(message):
+        latencies.append(time.time() - float(message.text.rsplit("@", 1)[1]))
+
+    # Il poller reale; la pianificazione HA (async_call_later) è sostituita da sleep
+    poller = sms_poller.GammuSmsPoller(None, client, args.sms_interval, on_sms)
+    polls = 0
+
+    async def inject():
+        interval = 1 / args.rate
+        deadline = time.monotonic() + args.duration
+        async with aiohttp.ClientSession() as session:
+            while time.monotonic() < deadline:
+                await session.post(f"http://127.0.0.1:{port}/_bench/push?count=1")
+                await asyncio.sleep(interval)
+
+    async def poll(injector):
+        nonlocal polls
+        while True:
+            received = await poller.async_check_sms_messages()
+            polls += 1
+            if injector.done() and not received:
+                return
+            poller._interval = poller._next_interval(received)
+            await asyncio.sleep(poller._interval)
+
+    try:
+        with LoopMonitor() as monitor:
+            injector = asyncio.create_task(inject())
+            await poll(injector)
+    finally:
+        await client.async_close()
+
+    return {
+        "duration_s": args.duration,
+        "rate_msg_s": args.rate,
+        "received": len(latencies),
+        "polls": polls,
+        "getsms_calls": client.stats.endpoints["getsms"].calls,
+        "e2e_p50_s": round(_percentile(latencies, 0.5) or 0, 3),
+        "e2e_p95_s": round(_percentile(latencies, 0.95) or 0, 3),
+        "e2e_max_s": round(max(latencies, default=0), 3),
+        **monitor.summary(),
+    }
+
+
+async def bench_coordinator(port, args):
+    from homeassistant.core import HomeAssistant
+
+    coordinator_module = load("coordinator")
+    hass = HomeAssistant(args.config_dir)
+    refresh_times = []
+    async with aiohttp.ClientSession() as session:
+        # Con count=0 il gateway ritorna solo la profondità attuale della coda
+        async with session.post(f"http://127.0.0.1:{port}/_bench/push?count=0") as response:
+            missing = args.inbox - (await response.json())["queued"]
+        if missing > 0:
+            await session.post(f"http://127.0.0.1:{port}/_bench/push?count={missing}")
+
+        coordinator = coordinator_module.SmsGammuCoordinator(
+            hass, session, "127.0.0.1", port, "admin", "password", args.sms_interval
+        )
+        with LoopMonitor() as monitor:
+            for _ in range(args.refreshes):
+                start = time.perf_counter()
+                await coordinator._async_update_data()
+                refresh_times.append(time.perf_counter() - start)
+
+    return {
+        "inbox_size": len(coordinator.data["sms_list"]),
+        "refreshes": args.refreshes,
+        "refresh_mean_ms": round(statistics.mean(refresh_times) * 1000, 2),
+        "refresh_p95_ms": round((_percentile(refresh_times, 0.95) or 0) * 1000, 2),
+        **monitor.summary(),
+    }
+
+
+SCENARIOS = {
+    "send": bench_send,
+    "receive": bench_receive,
+    "coordinator": bench_coordinator,
+}
+
+
+async def main(port, args):
+    results = {}
+    for name in args.scenario:
+        try:
+            results[name] = await SCENARIOS[name](port, args)
+        except ImportError as err:
+            results[name] = {"skipped": f"dipendenza mancante: {err.name}"}
+        print(f"[{name}]")
+        for key, value in results[name].items():
+            print(f"  {key:<18} {value}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--json", help="salva i risultati in un file JSON")
+    parser.add_argument("--messages", type=int, default=500, help="send: SMS da inviare")
+    parser.add_argument("--concurrency", type=int, default=1, help="send: invii contemporanei")
+    parser.add_argument("--rate", type=float, default=5.0, help="receive: SMS iniettati al secondo")
+    parser.add_argument("--duration", type=float, default=30.0, help="receive: durata dell'iniezione (s)")
+    parser.add_argument("--sms-interval", type=int, default=10, help="intervallo base del polling SMS (s)")
+    parser.add_argument("--inbox", type=int, default=200, help="coordinator: SMS nella inbox /sms")
+    parser.add_argument("--refreshes", type=int, default=20, help="coordinator: aggiornamenti da misurare")
+    parser.add_argument("--config-dir", default="/tmp", help="coordinator: config dir di Home Assistant")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    # Il gateway gira in un processo separato per non competere con il codice misurato
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve_forever, args=(port_queue,), kwargs=gateway_options(args), daemon=True
+    )
+    server.start()
+    try:
+        port = port_queue.get(timeout=10)
+        results = asyncio.run(main(port, args))
+    finally:
+        server.terminate()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"options": vars(args), "results": results}, file, indent=2)
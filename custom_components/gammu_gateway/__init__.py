@@ -1,136 +1,399 @@
 """Inizializzazione del componente SMS Gammu Gateway."""
+import asyncio
 import logging
-from datetime import timedelta
+import time
+
+import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, ServiceCall
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.event import async_track_time_interval
-from homeassistant.const import CONF_HOST, CONF_PORT, CONF_USERNAME, CONF_PASSWORD
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import dt as dt_util
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_PORT,
+    CONF_USERNAME,
+    CONF_PASSWORD,
+    EVENT_HOMEASSISTANT_STOP,
+)
 
 from .const import (
     DOMAIN, 
     CONF_SCAN_INTERVAL_SIGNAL, 
     CONF_SCAN_INTERVAL_SMS, 
-    EVENT_GAMMU_RECEIVED,
-    DEFAULT_SCAN_INTERVAL_SMS
+    CONF_SEND_RATE,
+    CONF_SEND_CONCURRENCY,
+    CONF_CONNECT_TIMEOUT,
+    CONF_READ_TIMEOUT,
+    CONF_WEIGHT,
+    CONF_REASSEMBLY_TIMEOUT,
+    CONF_EVENT_MODE,
+    CONF_BATCH_WINDOW,
+    CONF_PUSH_MODE,
+    CONF_SIGNAL_DEADBAND,
+    CONF_TRANSLITERATE,
+    CONF_MAX_SEGMENTS,
+    CONF_SEGMENT_OVERFLOW,
+    CONF_WEBHOOK_ID,
+    CONF_WATCHDOG,
+    DATA_POOL,
+    DATA_HISTORY,
+    DATA_COMMANDS,
+    CONF_COMMANDS,
+    CONF_ALLOWED_SENDERS,
+    HISTORY_FILE,
+    HISTORY_QUERY_MAX,
+    DEFAULT_SCAN_INTERVAL_SMS,
+    DEFAULT_SEND_RATE,
+    DEFAULT_SEND_CONCURRENCY,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_WEIGHT,
+    DEFAULT_REASSEMBLY_TIMEOUT,
+    DEFAULT_EVENT_MODE,
+    DEFAULT_BATCH_WINDOW,
+    DEFAULT_TRANSLITERATE,
+    DEFAULT_MAX_SEGMENTS,
+    DEFAULT_SEGMENT_OVERFLOW,
+    DEFAULT_SIGNAL_DEADBAND,
+    DEFAULT_WATCHDOG,
+    PUSH_SAFETY_POLL_INTERVAL,
 )
 from .api import GammuGatewayApiClient
+from .commands import COMMANDS_SCHEMA, GammuCommandDispatcher
+from .coordinator import GammuStatusCoordinator
+from .dedupe import SmsDedupeCache
+from .history import DIRECTION_IN, DIRECTION_OUT, GammuSmsHistory
+from .inbound import GammuSmsInbound
+from .outbox import GammuSmsOutbox
+from .pool import GammuGatewayPool
+from .push import GammuSmsWebhook
+from .sms_poller import GammuSmsPoller
+from .watchdog import GammuWatchdog
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = ["sensor", "button"]
 
+# Le regole dei comandi SMS si configurano in YAML, il resto dalla UI
+CONFIG_SCHEMA = vol.Schema({DOMAIN: COMMANDS_SCHEMA}, extra=vol.ALLOW_EXTRA)
+
+async def async_setup(hass: HomeAssistant, config: ConfigType):
+    """Legge le regole dei comandi SMS da configuration.yaml."""
+    if DOMAIN in config:
+        hass.data[DATA_COMMANDS] = config[DOMAIN]
+    return True
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up dell'integrazione da config entry."""
-    
-    session = async_get_clientsession(hass)
+    started = time.monotonic()
+
+    # Trasporto HTTP dedicato a questo gateway (pool keep-alive limitato)
     client = GammuGatewayApiClient(
         entry.data[CONF_HOST],
         entry.data[CONF_PORT],
         entry.data[CONF_USERNAME],
         entry.data[CONF_PASSWORD],
-        session
+        connect_timeout=entry.data.get(CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT),
+        read_timeout=entry.data.get(CONF_READ_TIMEOUT, DEFAULT_READ_TIMEOUT),
+    )
+
+    async def async_close_client(_event=None):
+        await client.async_close()
+
+    entry.async_on_unload(
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_close_client)
     )
 
     # --- 1. Gestione Sensori (Segnale e Rete) ---
-    async def async_update_data():
-        """Recupera dati segnale e rete."""
-        try:
-            signal_data = await client.get_signal()
-            network_data = await client.get_network()
-            return {"signal": signal_data, "network": network_data}
-        except Exception as err:
-            raise UpdateFailed(f"Errore aggiornamento dati: {err}")
+    # Intervallo adattivo: più frequente se i valori cambiano, in pausa se il modem è occupato
+    def modem_busy():
+        poller = data["sms_poller"]
+        return (
+            client.scheduler.depth > 0
+            or data["outbox"].active > 0
+            or (poller is not None and poller.backlog)
+        )
 
-    coordinator = DataUpdateCoordinator(
+    signal_interval = entry.data.get(CONF_SCAN_INTERVAL_SIGNAL, 30)
+    coordinator = GammuStatusCoordinator(
         hass,
-        _LOGGER,
-        name="gammu_coordinator",
-        update_method=async_update_data,
-        update_interval=timedelta(seconds=entry.data.get(CONF_SCAN_INTERVAL_SIGNAL, 30)),
+        client,
+        signal_interval,
+        deadband=entry.data.get(CONF_SIGNAL_DEADBAND, DEFAULT_SIGNAL_DEADBAND),
+        busy=modem_busy,
     )
 
-    await coordinator.async_config_entry_first_refresh()
-
     hass.data.setdefault(DOMAIN, {})
-    # Salviamo anche il listener per poterlo rimuovere all'unload
-    hass.data[DOMAIN][entry.entry_id] = {
+
+    # --- 2. Coda di invio e ricezione SMS ---
+    # Gli oggetti sono creati subito (servono alle piattaforme), storage e polling partono in background
+    pool = hass.data.get(DATA_POOL)
+    if pool is None:
+        pool = hass.data[DATA_POOL] = GammuGatewayPool(hass)
+
+    # Storico SMS condiviso da tutti i gateway (SQLite nella cartella di configurazione)
+    history = hass.data.get(DATA_HISTORY)
+    if history is None:
+        history = hass.data[DATA_HISTORY] = GammuSmsHistory(hass, hass.config.path(HISTORY_FILE))
+        history.async_start()
+        _async_register_history_service(hass, history)
+
+    outbox = GammuSmsOutbox(
+        hass,
+        client,
+        entry.entry_id,
+        entry.data.get(CONF_SEND_RATE, DEFAULT_SEND_RATE),
+        entry.data.get(CONF_SEND_CONCURRENCY, DEFAULT_SEND_CONCURRENCY),
+        failover=pool.async_failover,
+        transliterate=entry.data.get(CONF_TRANSLITERATE, DEFAULT_TRANSLITERATE),
+        max_segments=entry.data.get(CONF_MAX_SEGMENTS, DEFAULT_MAX_SEGMENTS),
+        segment_overflow=entry.data.get(CONF_SEGMENT_OVERFLOW, DEFAULT_SEGMENT_OVERFLOW),
+        history=history,
+    )
+
+    # Le impronte degli SMS già visti sopravvivono ai riavvii
+    dedupe = SmsDedupeCache(hass, entry.entry_id)
+
+    # Regole compilate una volta per gateway, con contatori propri
+    commands = None
+    commands_config = hass.data.get(DATA_COMMANDS)
+    if commands_config and commands_config[CONF_COMMANDS]:
+        commands = GammuCommandDispatcher(
+            hass,
+            commands_config[CONF_COMMANDS],
+            commands_config[CONF_ALLOWED_SENDERS],
+            gateway=entry.entry_id,
+        )
+
+    inbound = GammuSmsInbound(
+        hass,
+        dedupe,
+        entry.data.get(CONF_REASSEMBLY_TIMEOUT, DEFAULT_REASSEMBLY_TIMEOUT),
+        event_mode=entry.data.get(CONF_EVENT_MODE, DEFAULT_EVENT_MODE),
+        batch_window=entry.data.get(CONF_BATCH_WINDOW, DEFAULT_BATCH_WINDOW),
+        history=history,
+        gateway=entry.entry_id,
+        commands=commands,
+    )
+
+    # Reset automatico del modem se il gateway smette di rispondere o di ricevere
+    watchdog = None
+    if entry.data.get(CONF_WATCHDOG, DEFAULT_WATCHDOG):
+        watchdog = GammuWatchdog(hass, client, coordinator, outbox, entry.entry_id)
+
+    # Salviamo anche il poller SMS per poterlo fermare all'unload
+    data = hass.data[DOMAIN][entry.entry_id] = {
         "coordinator": coordinator,
         "client": client,
-        "sms_listener": None 
+        "outbox": outbox,
+        "dedupe": dedupe,
+        "inbound": inbound,
+        "commands": commands,
+        "watchdog": watchdog,
+        "push": None,
+        "sms_poller": None,
+        "sensor_writes": {},
+        "startup": {"setup": None, "services": None, "first_refresh": None},
     }
 
+    # I sensori partono dall'ultimo stato salvato finché non arriva il primo aggiornamento
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    # --- 2. Servizio Invio SMS ---
+    # --- 3. Avvio in background: un gateway lento o spento non blocca l'avvio di HA ---
+    data["startup_tasks"] = [
+        entry.async_create_background_task(
+            hass, _async_first_refresh(coordinator, data["startup"], started), f"{DOMAIN} first refresh"
+        ),
+        entry.async_create_background_task(
+            hass, _async_start_services(hass, entry, data, pool, signal_interval, started), f"{DOMAIN} startup"
+        ),
+    ]
+
+    data["startup"]["setup"] = round(time.monotonic() - started, 3)
+    return True
+
+async def _async_first_refresh(coordinator, startup, started):
+    """Primo aggiornamento di segnale e rete, senza bloccare il setup."""
+    await coordinator.async_refresh()
+    if coordinator.last_update_success:
+        startup["first_refresh"] = round(time.monotonic() - started, 3)
+    else:
+        _LOGGER.warning("Gateway non raggiungibile all'avvio, nuovo tentativo al prossimo aggiornamento")
+
+async def _async_start_services(hass: HomeAssistant, entry: ConfigEntry, data, pool, signal_interval, started):
+    """Ripristina coda e cache, registra il servizio di invio e avvia la ricezione."""
+    client = data["client"]
+    outbox = data["outbox"]
+    inbound = data["inbound"]
+
+    # Servizio Invio SMS (coda persistente + pool di gateway)
+    await outbox.async_start()
+    if not len(pool):
+        _async_register_send_service(hass, pool)
+    pool.async_add(entry.entry_id, client, outbox, entry.data.get(CONF_WEIGHT, DEFAULT_WEIGHT))
+
+    # Polling Ricezione SMS (/getsms): prima ripristiniamo le impronte già viste
+    await data["dedupe"].async_load()
+
+    # Impostiamo l'intervallo base: il poller lo riduce sotto carico e lo allunga quando è inattivo
+    sms_interval = entry.data.get(CONF_SCAN_INTERVAL_SMS, DEFAULT_SCAN_INTERVAL_SMS)
+
+    # In push gli SMS arrivano sul webhook; il polling resta, lento, per quelli persi
+    if entry.data.get(CONF_PUSH_MODE) and entry.data.get(CONF_WEBHOOK_ID):
+        push = GammuSmsWebhook(hass, entry.data[CONF_WEBHOOK_ID], inbound.async_process)
+        push.async_register()
+        data["push"] = push
+        sms_interval = max(sms_interval, PUSH_SAFETY_POLL_INTERVAL)
+
+    poller = GammuSmsPoller(hass, client, sms_interval, inbound.async_process)
+    # Sfasiamo il polling SMS rispetto al primo aggiornamento di segnale e rete
+    poller.async_start(initial_delay=min(sms_interval, signal_interval) / 2)
+
+    # Salviamo il riferimento per fermarlo quando scarichiamo l'integrazione
+    data["sms_poller"] = poller
+
+    if data["watchdog"] is not None:
+        data["watchdog"].async_start(poller)
+    data["startup"]["services"] = round(time.monotonic() - started, 3)
+
+SEND_SMS_SCHEMA = vol.Schema({
+    vol.Required("number"): cv.string,
+    vol.Required("message"): cv.string,
+    vol.Optional("gateway"): cv.string,
+    vol.Optional("sticky", default=False): cv.boolean,
+})
+
+def _async_register_send_service(hass: HomeAssistant, pool: GammuGatewayPool):
+    """Registra il servizio send_sms, unico per tutti i gateway."""
+
     async def send_sms_service(call: ServiceCall):
-        number = call.data.get("number")
-        message = call.data.get("message")
+        number = call.data["number"]
+        message = call.data["message"]
+        # Il job viene accodato subito: l'esito arriva con gli eventi di invio
         try:
-            await client.send_sms(number, message)
-            _LOGGER.info(f"SMS inviato a {number}")
-        except Exception as e:
-            _LOGGER.error(f"Impossibile inviare SMS: {e}")
-            raise e
+            job, entry_id = pool.async_enqueue(
+                number,
+                message,
+                entry_id=call.data.get("gateway"),
+                sticky=call.data["sticky"],
+            )
+        except ValueError as err:
+            raise HomeAssistantError(str(err)) from err
+        _LOGGER.debug(
+            "SMS per %s accodato sul gateway %s (job %s, %d segmenti %s)",
+            number, entry_id, job["id"], job["segments"], job["encoding"],
+        )
+        return {
+            "job_id": job["id"],
+            "gateway": entry_id,
+            "encoding": job["encoding"],
+            "segments": job["segments"],
+            "transliterated": job["transliterated"],
+            "truncated": job["truncated"],
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        "send_sms",
+        send_sms_service,
+        schema=SEND_SMS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+HISTORY_QUERY_SCHEMA = vol.Schema({
+    vol.Optional("number"): cv.string,
+    vol.Optional("direction"): vol.In([DIRECTION_IN, DIRECTION_OUT]),
+    vol.Optional("gateway"): cv.string,
+    vol.Optional("start"): cv.datetime,
+    vol.Optional("end"): cv.datetime,
+    vol.Optional("limit", default=50): vol.All(vol.Coerce(int), vol.Range(min=1, max=HISTORY_QUERY_MAX)),
+    vol.Optional("cursor"): cv.string,
+})
 
-    hass.services.async_register(DOMAIN, "send_sms", send_sms_service)
+def _async_register_history_service(hass: HomeAssistant, history: GammuSmsHistory):
+    """Registra il servizio query_history, unico per tutti i gateway."""
 
-    # --- 3. Polling Ricezione SMS (/getsms) ---
-    async def check_sms_messages(now):
-        """Controlla periodicamente se ci sono nuovi SMS."""
+    async def query_history_service(call: ServiceCall):
+        start = call.data.get("start")
+        end = call.data.get("end")
         try:
-            sms_data = await client.get_last_sms()
-            
-            # Analizziamo la risposta. Ci aspettiamo chiavi come 'Text' e 'Number' o 'Sender'
-            # Se 'Text' è vuoto o None, non c'è messaggio.
-            text = sms_data.get("Text")
-            
-            if text:
-                sender = sms_data.get("Number") or sms_data.get("Sender") or "Unknown"
-                date = sms_data.get("Date") or sms_data.get("DateTime")
-                state = sms_data.get("State")
-                
-                _LOGGER.info(f"Nuovo SMS ricevuto da {sender}: {text}")
-                
-                # Scateniamo l'evento
-                hass.bus.async_fire(EVENT_GAMMU_RECEIVED, {
-                    "sender": sender,
-                    "text": text,
-                    "date": date,
-                    "state": state
-                })
-            else:
-                _LOGGER.debug("Nessun nuovo SMS.")
-
-        except Exception as e:
-            # Non facciamo crashare tutto se una chiamata fallisce, solo log
-            _LOGGER.warning(f"Errore durante controllo SMS: {e}")
-
-    # Impostiamo l'intervallo
-    sms_interval = entry.data.get(CONF_SCAN_INTERVAL_SMS, DEFAULT_SCAN_INTERVAL_SMS)
-    
-    # Avviamo il timer periodico
-    remove_listener = async_track_time_interval(
-        hass, 
-        check_sms_messages, 
-        timedelta(seconds=sms_interval)
-    )
-    
-    # Salviamo il riferimento per cancellarlo quando scarichiamo l'integrazione
-    hass.data[DOMAIN][entry.entry_id]["sms_listener"] = remove_listener
+            messages, next_cursor = await history.async_query(
+                number=call.data.get("number"),
+                direction=call.data.get("direction"),
+                gateway=call.data.get("gateway"),
+                start=dt_util.as_utc(start).timestamp() if start else None,
+                end=dt_util.as_utc(end).timestamp() if end else None,
+                limit=call.data["limit"],
+                cursor=call.data.get("cursor"),
+            )
+        except ValueError as err:
+            raise HomeAssistantError(str(err)) from err
+        return {"messages": messages, "next_cursor": next_cursor}
 
-    return True
+    hass.services.async_register(
+        DOMAIN,
+        "query_history",
+        query_history_service,
+        schema=HISTORY_QUERY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Rimuove l'integrazione."""
-    # Cancelliamo il timer degli SMS
-    listener = hass.data[DOMAIN][entry.entry_id].get("sms_listener")
-    if listener:
-        listener()
+    # Interrompiamo l'avvio in background se non è ancora terminato
+    for task in hass.data[DOMAIN][entry.entry_id]["startup_tasks"]:
+        task.cancel()
+    await asyncio.gather(*hass.data[DOMAIN][entry.entry_id]["startup_tasks"], return_exceptions=True)
+
+    # Chiudiamo il webhook della ricezione in push
+    push = hass.data[DOMAIN][entry.entry_id].get("push")
+    if push:
+        push.async_unregister()
+
+    # Fermiamo il watchdog prima di tutto il resto, per non resettare un modem in chiusura
+    watchdog = hass.data[DOMAIN][entry.entry_id].get("watchdog")
+    if watchdog:
+        watchdog.async_stop()
+
+    # Fermiamo il polling degli SMS
+    poller = hass.data[DOMAIN][entry.entry_id].get("sms_poller")
+    if poller:
+        poller.async_stop()
+
+    # Emettiamo gli SMS multipart rimasti incompleti
+    inbound = hass.data[DOMAIN][entry.entry_id].get("inbound")
+    if inbound:
+        await inbound.async_stop()
+
+    # Togliamo il gateway dal pool; con l'ultimo rimuoviamo anche il servizio
+    others = [entry_id for entry_id in hass.data[DOMAIN] if entry_id != entry.entry_id]
+    pool = hass.data.get(DATA_POOL)
+    if pool is not None:
+        pool.async_remove(entry.entry_id)
+        if not len(pool) and not others:
+            if hass.services.has_service(DOMAIN, "send_sms"):
+                hass.services.async_remove(DOMAIN, "send_sms")
+            hass.data.pop(DATA_POOL)
+
+    # Fermiamo la coda di invio salvando i job non ancora inviati
+    outbox = hass.data[DOMAIN][entry.entry_id].get("outbox")
+    if outbox:
+        await outbox.async_stop()
+
+    # Con l'ultimo gateway chiudiamo lo storico (dopo coda e ricezione, che vi scrivono)
+    history = hass.data.get(DATA_HISTORY)
+    if history is not None and not others:
+        if hass.services.has_service(DOMAIN, "query_history"):
+            hass.services.async_remove(DOMAIN, "query_history")
+        await hass.data.pop(DATA_HISTORY).async_stop()
 
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        data = hass.data[DOMAIN].pop(entry.entry_id)
+        if data["dedupe"]:
+            await data["dedupe"].async_save()
+        await data["client"].async_close()
     return unload_ok
\ No newline at end of file
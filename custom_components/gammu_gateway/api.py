@@ -1,71 +1,254 @@
 """API Client per SMS Gammu Gateway."""
+import asyncio
+import base64
 import logging
+import time
 import aiohttp
-import async_timeout
+
+from .breaker import CircuitBreaker, LatencyEstimator
+from .models import CommandResult, NetworkInfo, SignalInfo, SmsMessage, decode_json
+from .scheduler import ModemScheduler, PRIORITY_SEND, PRIORITY_RECEIVE, PRIORITY_STATUS
+from .stats import GatewayStats
+from .const import (
+    API_POOL_SIZE,
+    API_KEEPALIVE_TIMEOUT,
+    ADAPTIVE_TIMEOUT_MIN,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    MODEM_CONCURRENCY,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+ENDPOINTS = ("signal", "network", "getsms", "sms", "reset")
+# Endpoint non idempotenti: il timeout adattivo non scende mai sotto read_timeout
+NON_IDEMPOTENT_ENDPOINTS = ("sms", "reset", "getsms")
+
+
+class GammuGatewayApiError(Exception):
+    """Errore nella comunicazione con il gateway.
+
+    status è il codice HTTP della risposta, None per errori di rete o timeout.
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class GammuGatewayTimeoutError(GammuGatewayApiError):
+    """Il gateway non ha risposto in tempo: la richiesta potrebbe essere stata eseguita."""
+
+
+class GammuGatewayCircuitOpenError(GammuGatewayApiError):
+    """Chiamata rifiutata perché il circuito verso il gateway è aperto."""
+
+
 class GammuGatewayApiClient:
-    """Client API per comunicare con il gateway."""
+    """Client API per comunicare con il gateway.
+
+    Se non viene passata una sessione il client crea un proprio trasporto
+    dedicato al gateway (pool keep-alive limitato) da chiudere con async_close().
+    Le chiamate passano da un circuit breaker e usano un timeout di lettura
+    derivato dalla latenza stimata di ogni endpoint. Tutte le chiamate al
+    modem passano dallo scheduler del gateway: invii prima della ricezione,
+    ricezione prima di segnale e rete.
+    """
 
-    def __init__(self, host, port, username, password, session):
+    def __init__(
+        self,
+        host,
+        port,
+        username,
+        password,
+        session=None,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+        modem_concurrency=MODEM_CONCURRENCY,
+    ):
         self._host = host
         self._port = port
         self._username = username
         self._password = password
         self._session = session
+        self._owns_session = session is None
         self._base_url = f"http://{host}:{port}"
 
+        # Header di autenticazione e URL calcolati una sola volta
+        credentials = base64.b64encode(f"{username}:{password}".encode("latin1")).decode()
+        self._headers = {aiohttp.hdrs.AUTHORIZATION: f"Basic {credentials}"}
+        self._urls = {endpoint: f"{self._base_url}/{endpoint}" for endpoint in ENDPOINTS}
+        self._connect_timeout = connect_timeout
+        self._timeout = aiohttp.ClientTimeout(
+            total=connect_timeout + read_timeout,
+            connect=connect_timeout,
+            sock_read=read_timeout,
+        )
+
+        self.breaker = CircuitBreaker(f"{host}:{port}")
+        self.scheduler = ModemScheduler(f"{host}:{port}", modem_concurrency)
+        self.stats = GatewayStats(ENDPOINTS)
+        # /sms e /reset non sono idempotenti: un timeout più stretto di read_timeout porterebbe a
+        # invii doppi (un SMS multiparte o una scrittura lenta del modem superano facilmente la media).
+        # /getsms cancella l'SMS letto: se rinunciassimo prima della risposta il messaggio andrebbe perso
+        self.latency = {
+            endpoint: LatencyEstimator(read_timeout, self._min_timeout(endpoint, read_timeout))
+            for endpoint in ENDPOINTS
+        }
+
+    @staticmethod
+    def _min_timeout(endpoint, read_timeout):
+        if endpoint in NON_IDEMPOTENT_ENDPOINTS:
+            return read_timeout
+        return ADAPTIVE_TIMEOUT_MIN
+
     async def get_signal(self):
-        """Ottiene il livello del segnale."""
-        return await self._api_wrapper("GET", f"{self._base_url}/signal")
+        """Ottiene il livello del segnale (SignalInfo)."""
+        return await self._scheduled(PRIORITY_STATUS, "GET", "signal", SignalInfo, merge=True)
 
     async def get_network(self):
-        """Ottiene le informazioni sulla rete."""
-        return await self._api_wrapper("GET", f"{self._base_url}/network")
+        """Ottiene le informazioni sulla rete (NetworkInfo)."""
+        return await self._scheduled(PRIORITY_STATUS, "GET", "network", NetworkInfo, merge=True)
 
     async def get_last_sms(self):
-        """Ottiene l'ultimo SMS ricevuto e lo rimuove dalla coda del gateway."""
+        """Ottiene l'ultimo SMS ricevuto (SmsMessage, None se la coda è vuota) e lo rimuove dal gateway."""
         # Endpoint indicato da te per la lettura (e cancellazione) dell'ultimo SMS
-        return await self._api_wrapper("GET", f"{self._base_url}/getsms")
+        # Ogni lettura consuma un SMS: le richieste non vanno mai unite
+        return await self._scheduled(PRIORITY_RECEIVE, "GET", "getsms", SmsMessage)
 
-    async def send_sms(self, number, message):
-        """Invia un SMS."""
+    async def send_sms(self, number, message, smsc=None):
+        """Invia un SMS (CommandResult)."""
         payload = {"number": number, "text": message}
-        return await self._api_wrapper("POST", f"{self._base_url}/sms", json_data=payload)
+        if smsc:
+            payload["smsc"] = smsc
+        return await self._scheduled(PRIORITY_SEND, "POST", "sms", CommandResult, json_data=payload)
+
+    async def reset_modem(self, bypass_breaker=False):
+        """Invia il comando di reset al modem (CommandResult).
+
+        Con bypass_breaker il reset parte anche a circuito aperto: è il modo
+        con cui il watchdog prova a sbloccare un modem che non risponde.
+        """
+        if bypass_breaker:
+            # Non unito a un eventuale reset normale, che verrebbe rifiutato dal circuito
+            return await self._scheduled(
+                PRIORITY_SEND, "GET", "reset", CommandResult, bypass_breaker=True
+            )
+        return await self._scheduled(PRIORITY_SEND, "GET", "reset", CommandResult, merge=True)
+
+    async def async_close(self):
+        """Ferma lo scheduler e chiude il trasporto dedicato (se creato dal client)."""
+        await self.scheduler.async_stop()
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _scheduled(
+        self, priority, method, endpoint, model, json_data=None, merge=False, bypass_breaker=False
+    ):
+        """Accoda la chiamata nello scheduler del modem."""
+        return await self.scheduler.async_run(
+            priority,
+            lambda: self._api_wrapper(method, endpoint, json_data, model, bypass_breaker),
+            key=(method, endpoint) if merge else None,
+        )
+
+    def _get_session(self):
+        """Ritorna la sessione HTTP, creando il pool dedicato al primo utilizzo."""
+        if self._session is None or (self._owns_session and self._session.closed):
+            connector = aiohttp.TCPConnector(
+                limit=API_POOL_SIZE,
+                limit_per_host=API_POOL_SIZE,
+                keepalive_timeout=API_KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+            self._owns_session = True
+        return self._session
 
-    async def reset_modem(self):
-        """Invia il comando di reset al modem."""
-        return await self._api_wrapper("GET", f"{self._base_url}/reset")
+    def _request_timeout(self, endpoint):
+        """Timeout della singola chiamata, derivato dalla latenza stimata."""
+        read_timeout = self.latency[endpoint].timeout
+        return aiohttp.ClientTimeout(
+            total=self._connect_timeout + read_timeout,
+            connect=self._connect_timeout,
+            sock_read=read_timeout,
+        )
+
+    async def _api_wrapper(self, method, endpoint, json_data=None, model=None, bypass_breaker=False):
+        """Esegue la chiamata HTTP gestendo l'autenticazione Basic.
+
+        La risposta viene convertita nel modello indicato; senza modello
+        ritorna il JSON decodificato. Con bypass_breaker la chiamata non
+        chiede il permesso al circuit breaker, ma il suo esito viene
+        comunque registrato.
+        """
+        if not bypass_breaker and not self.breaker.allow_request():
+            # Circuito aperto: falliamo subito senza attendere il timeout
+            self.stats.record_rejected(endpoint)
+            _LOGGER.debug("Chiamata a /%s rifiutata: circuito aperto", endpoint)
+            raise GammuGatewayCircuitOpenError(
+                f"Gateway non raggiungibile, nuovo tentativo tra {self.breaker.retry_after:.0f}s"
+            )
+
+        session = self._get_session()
+        url = self._urls[endpoint]
+        estimator = self.latency[endpoint]
+        status = None
+        nbytes = 0
+        start = time.monotonic()
 
-    async def _api_wrapper(self, method, url, json_data=None):
-        """Esegue la chiamata HTTP gestendo l'autenticazione Basic."""
-        auth = aiohttp.BasicAuth(self._username, self._password)
-        
         try:
-            async with async_timeout.timeout(10):
-                if method == "GET":
-                    response = await self._session.get(url, auth=auth)
+            # Il context manager rilascia sempre la connessione al pool
+            async with session.request(
+                method, url, headers=self._headers, json=json_data,
+                timeout=self._request_timeout(endpoint),
+            ) as response:
+                body = await response.read()
+                status = response.status
+                nbytes = len(body)
+                estimator.add_sample(time.monotonic() - start)
+
+                # Errori lato server contano per il circuit breaker
+                if status >= 500:
+                    self.breaker.record_failure()
                 else:
-                    response = await self._session.post(url, auth=auth, json=json_data)
-                
-                if response.status == 401:
-                    raise Exception("Errore di autenticazione: Username o Password errati")
-                
+                    self.breaker.record_success()
+
+                if status == 401:
+                    raise GammuGatewayApiError("Errore di autenticazione: Username o Password errati", status)
+
                 # Per il reset o getsms potremmo ricevere risposte diverse, ma 200 è lo standard
-                if response.status != 200:
-                    text = await response.text()
-                    raise Exception(f"Errore API ({response.status}): {text}")
+                if status != 200:
+                    text = body.decode(errors="replace")
+                    raise GammuGatewayApiError(f"Errore API ({status}): {text}", status)
 
+                # /sms e /reset possono rispondere con un OK testuale: lo gestisce CommandResult
+                if model is CommandResult:
+                    return CommandResult.from_response(status, body)
                 try:
-                    return await response.json()
-                except:
-                    # Se la risposta non è JSON (es. un OK testuale), torniamo un dizionario vuoto o lo stato
-                    return {"status": "ok", "raw": await response.text()}
+                    payload = decode_json(body)
+                    return payload if model is None else model.from_response(payload)
+                except ValueError as err:
+                    raise GammuGatewayApiError(f"Risposta non valida da /{endpoint}: {err}") from err
 
         except aiohttp.ClientError as err:
+            status = status or "connection"
+            self.breaker.record_failure()
             _LOGGER.error("Errore di connessione al Gammu Gateway: %s", err)
-            raise Exception(f"Errore di connessione: {err}")
-        except Exception as err:
-            _LOGGER.error("Errore generico API: %s", err)
-            raise
\ No newline at end of file
+            raise GammuGatewayApiError(f"Errore di connessione: {err}")
+        except asyncio.TimeoutError:
+            status = status or "timeout"
+            self.breaker.record_failure()
+            estimator.on_timeout()
+            _LOGGER.error("Timeout nella chiamata al Gammu Gateway: %s", url)
+            raise GammuGatewayTimeoutError(f"Timeout nella chiamata a {url}")
+        except asyncio.CancelledError:
+            if not bypass_breaker:
+                self.breaker.release_probe()
+            raise
+        except GammuGatewayApiError as err:
+            _LOGGER.error("Errore API: %s", err)
+            raise
+        finally:
+            # status resta None solo se la chiamata è stata annullata
+            if status is not None:
+                self.stats.record(endpoint, method, time.monotonic() - start, status, nbytes)
@@ -0,0 +1,154 @@
+"""Circuit breaker e stima delle latenze per le chiamate al Gammu Gateway."""
+import logging
+import time
+
+from .const import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RECOVERY_TIMEOUT,
+    BREAKER_HALF_OPEN_SUCCESSES,
+    ADAPTIVE_TIMEOUT_MIN,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Apre il circuito dopo errori consecutivi e lo richiude dopo probe riusciti.
+
+    - closed: le chiamate passano, gli errori consecutivi vengono contati;
+    - open: le chiamate falliscono subito per BREAKER_RECOVERY_TIMEOUT secondi;
+    - half_open: passa una sola chiamata di prova alla volta; dopo
+      BREAKER_HALF_OPEN_SUCCESSES successi il circuito si richiude,
+      al primo errore si riapre.
+    """
+
+    def __init__(
+        self,
+        name,
+        failure_threshold=BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout=BREAKER_RECOVERY_TIMEOUT,
+        half_open_successes=BREAKER_HALF_OPEN_SUCCESSES,
+    ):
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._half_open_successes = half_open_successes
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.open_count = 0
+        self._probe_in_flight = False
+        self._probe_successes = 0
+        self._listeners = []
+
+    def allow_request(self):
+        """Ritorna True se la chiamata può partire (eventualmente come probe)."""
+        if self.state == STATE_CLOSED:
+            return True
+        if self.state == STATE_OPEN:
+            if time.monotonic() - self.opened_at < self._recovery_timeout:
+                return False
+            self._set_state(STATE_HALF_OPEN)
+        # half_open: una sola chiamata di prova alla volta
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    @property
+    def retry_after(self):
+        """Secondi mancanti alla prossima chiamata di prova (0 se non aperto)."""
+        if self.state != STATE_OPEN:
+            return 0
+        return max(0, self._recovery_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        if self.state == STATE_HALF_OPEN:
+            self._probe_in_flight = False
+            self._probe_successes += 1
+            if self._probe_successes >= self._half_open_successes:
+                self._set_state(STATE_CLOSED)
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == STATE_HALF_OPEN:
+            self._probe_in_flight = False
+            self._open()
+        elif self.state == STATE_CLOSED and self.consecutive_failures >= self._failure_threshold:
+            self._open()
+
+    def release_probe(self):
+        """Libera lo slot di prova se la chiamata non ha dato un esito utile."""
+        self._probe_in_flight = False
+
+    def add_listener(self, update_callback):
+        """Registra una callback chiamata ad ogni cambio di stato."""
+        self._listeners.append(update_callback)
+
+        def remove_listener():
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self.open_count += 1
+        self._set_state(STATE_OPEN)
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        if state == STATE_OPEN:
+            _LOGGER.warning(
+                "Gateway %s non risponde (%d errori consecutivi): circuito aperto per %ds",
+                self._name, self.consecutive_failures, self._recovery_timeout,
+            )
+        elif state == STATE_CLOSED:
+            _LOGGER.info("Gateway %s di nuovo raggiungibile: circuito chiuso", self._name)
+        self.state = state
+        self._probe_successes = 0
+        for update_callback in list(self._listeners):
+            update_callback()
+
+
+class LatencyEstimator:
+    """Stima della latenza di un endpoint (media e varianza mobili, come l'RTO di TCP).
+
+    Il timeout suggerito è srtt + 4 * rttvar, limitato tra
+    ADAPTIVE_TIMEOUT_MIN e il timeout di lettura configurato.
+    """
+
+    ALPHA = 0.125
+    BETA = 0.25
+
+    def __init__(self, max_timeout, min_timeout=ADAPTIVE_TIMEOUT_MIN):
+        self._max_timeout = max_timeout
+        self._min_timeout = min(min_timeout, max_timeout)
+        self.srtt = None
+        self.rttvar = None
+
+    @property
+    def timeout(self):
+        if self.srtt is None:
+            return self._max_timeout
+        estimate = self.srtt + 4 * self.rttvar
+        return min(max(estimate, self._min_timeout), self._max_timeout)
+
+    def add_sample(self, seconds):
+        if self.srtt is None:
+            self.srtt = seconds
+            self.rttvar = seconds / 2
+            return
+        self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - seconds)
+        self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * seconds
+
+    def on_timeout(self):
+        """Dopo un timeout raddoppia la stima, per non scadere di nuovo subito."""
+        if self.srtt is not None:
+            self.srtt = min(self.srtt * 2, self._max_timeout)
+            self.rttvar = min(self.rttvar * 2, self._max_timeout)
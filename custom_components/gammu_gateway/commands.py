@@ -0,0 +1,165 @@
+"""Dispatcher dei comandi ricevuti via SMS ("ARM", "STATUS", "OPEN GATE 1234")."""
+import logging
+import re
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers import template
+from homeassistant.util import dt as dt_util
+
+from .const import CONF_ALLOWED_SENDERS, CONF_COMMANDS, EVENT_GAMMU_COMMAND
+
+_LOGGER = logging.getLogger(__name__)
+
+CONF_NAME = "name"
+CONF_KEYWORD = "keyword"
+CONF_PATTERN = "pattern"
+CONF_SENDERS = "senders"
+CONF_SERVICE = "service"
+CONF_DATA = "data"
+CONF_EVENT = "event"
+
+# Separa mittente e testo nella stringa confrontata con l'espressione unica
+_SEPARATOR = "\x00"
+
+
+def _pattern(value):
+    """Valida una regex di comando: deve poter stare in un'alternativa con le altre."""
+    value = cv.string(value)
+    if re.search(r"\\[1-9]", value):
+        raise vol.Invalid("Riferimenti numerici non supportati, usare gruppi con nome (?P=nome)")
+    try:
+        re.compile(f"x|(?:{value})")
+    except re.error as err:
+        raise vol.Invalid(f"Espressione regolare non valida: {err}") from err
+    return value
+
+
+def _unique_names(rules):
+    names = [rule[CONF_NAME] for rule in rules]
+    if len(names) != len(set(names)):
+        raise vol.Invalid("I nomi delle regole devono essere univoci")
+    return rules
+
+
+COMMAND_SCHEMA = vol.All(
+    vol.Schema({
+        vol.Required(CONF_NAME): cv.slug,
+        vol.Exclusive(CONF_KEYWORD, "match"): cv.string,
+        vol.Exclusive(CONF_PATTERN, "match"): _pattern,
+        vol.Optional(CONF_SENDERS): vol.All(cv.ensure_list, [cv.string]),
+        vol.Exclusive(CONF_SERVICE, "action"): cv.service,
+        vol.Exclusive(CONF_EVENT, "action"): cv.string,
+        vol.Optional(CONF_DATA, default={}): vol.All(dict, cv.template_complex),
+    }),
+    cv.has_at_least_one_key(CONF_KEYWORD, CONF_PATTERN),
+)
+
+COMMANDS_SCHEMA = vol.Schema({
+    vol.Optional(CONF_ALLOWED_SENDERS, default=[]): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(CONF_COMMANDS, default=[]): vol.All(cv.ensure_list, [COMMAND_SCHEMA], _unique_names),
+})
+
+
+def compile_rules(rules, allowed_senders=()):
+    """Compila tutte le regole in un'unica espressione regolare.
+
+    Ogni regola diventa un'alternativa con nome `_r<indice>` che contiene
+    anche i mittenti ammessi, così un solo confronto su "mittente\\0testo"
+    sceglie la prima regola valida. I gruppi con nome delle regex utente
+    vengono rinominati `_r<indice>__<nome>` per evitare collisioni.
+    """
+    alternatives = []
+    for index, rule in enumerate(rules):
+        prefix = f"_r{index}__"
+        senders = rule.get(CONF_SENDERS) or list(allowed_senders)
+        senders_re = "|".join(re.escape(sender) for sender in senders) if senders else f"[^{_SEPARATOR}]*"
+
+        if CONF_KEYWORD in rule:
+            # Parola chiave seguita (opzionalmente) da argomenti liberi
+            body = rf"{re.escape(rule[CONF_KEYWORD].strip())}(?:\s+(?P<{prefix}args>.*))?"
+        else:
+            body = re.sub(r"\(\?P<(\w+)>", rf"(?P<{prefix}\1>", rule[CONF_PATTERN])
+            body = re.sub(r"\(\?P=(\w+)\)", rf"(?P={prefix}\1)", body)
+
+        alternatives.append(f"(?P<_r{index}>(?:{senders_re}){_SEPARATOR}(?:{body}))")
+
+    if not alternatives:
+        return None
+    return re.compile("|".join(alternatives), re.IGNORECASE | re.DOTALL)
+
+
+class GammuCommandDispatcher:
+    """Confronta ogni SMS ricevuto con le regole e chiama il servizio o lancia l'evento.
+
+    Le regole sono provate nell'ordine di configurazione; vince la prima
+    il cui testo (intero, spazi esterni esclusi) e mittente corrispondono.
+    """
+
+    def __init__(self, hass: HomeAssistant, rules, allowed_senders=(), gateway=None):
+        self._hass = hass
+        self._rules = rules
+        self._gateway = gateway
+        self._matcher = compile_rules(rules, allowed_senders)
+        self.counters = {
+            rule[CONF_NAME]: {"matches": 0, "errors": 0, "last_match": None} for rule in rules
+        }
+        self.unmatched = 0
+
+    def __len__(self):
+        return len(self._rules)
+
+    @property
+    def matches(self):
+        """Comandi riconosciuti in totale."""
+        return sum(counter["matches"] for counter in self.counters.values())
+
+    async def async_dispatch(self, sms):
+        """Esegue l'azione della prima regola che corrisponde; ritorna il nome della regola."""
+        if self._matcher is None:
+            return None
+        text = (sms.get("text") or "").strip()
+        match = self._matcher.fullmatch(f"{sms['sender']}{_SEPARATOR}{text}")
+        if match is None:
+            self.unmatched += 1
+            return None
+
+        index = int(match.lastgroup[2:])
+        rule = self._rules[index]
+        prefix = f"_r{index}__"
+        groups = {
+            name[len(prefix):]: value
+            for name, value in match.groupdict().items()
+            if name.startswith(prefix)
+        }
+        counter = self.counters[rule[CONF_NAME]]
+        counter["matches"] += 1
+        counter["last_match"] = dt_util.utcnow().isoformat()
+
+        variables = {
+            "rule": rule[CONF_NAME],
+            "sender": sms["sender"],
+            "text": text,
+            "date": sms.get("date"),
+            "gateway": self._gateway,
+            "match": groups,
+        }
+        _LOGGER.debug("SMS da %s: comando '%s'", sms["sender"], rule[CONF_NAME])
+
+        try:
+            data = template.render_complex(rule[CONF_DATA], variables)
+            if CONF_SERVICE in rule:
+                domain, service = rule[CONF_SERVICE].split(".", 1)
+                await self._hass.services.async_call(domain, service, data, blocking=False)
+            else:
+                self._hass.bus.async_fire(rule.get(CONF_EVENT, EVENT_GAMMU_COMMAND), {**variables, **data})
+        except (HomeAssistantError, vol.Invalid) as err:
+            counter["errors"] += 1
+            _LOGGER.error("Comando SMS '%s' da %s fallito: %s", rule[CONF_NAME], sms["sender"], err)
+        return rule[CONF_NAME]
+
+    def as_dict(self):
+        return {"rules": self.counters, "unmatched": self.unmatched}
@@ -1,6 +1,7 @@
 """Config flow per l'integrazione SMS Gammu Gateway."""
 import voluptuous as vol
 from homeassistant import config_entries
+from homeassistant.components import webhook
 from homeassistant.const import CONF_HOST, CONF_PORT, CONF_USERNAME, CONF_PASSWORD
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 import homeassistant.helpers.config_validation as cv
@@ -13,7 +14,40 @@ from .const import (
     DEFAULT_SCAN_INTERVAL_SIGNAL,
     DEFAULT_SCAN_INTERVAL_SMS,
     CONF_SCAN_INTERVAL_SIGNAL,
-    CONF_SCAN_INTERVAL_SMS
+    CONF_SCAN_INTERVAL_SMS,
+    CONF_SEND_RATE,
+    CONF_SEND_CONCURRENCY,
+    DEFAULT_SEND_RATE,
+    DEFAULT_SEND_CONCURRENCY,
+    CONF_CONNECT_TIMEOUT,
+    CONF_READ_TIMEOUT,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    CONF_WEIGHT,
+    DEFAULT_WEIGHT,
+    CONF_REASSEMBLY_TIMEOUT,
+    DEFAULT_REASSEMBLY_TIMEOUT,
+    CONF_EVENT_MODE,
+    CONF_BATCH_WINDOW,
+    DEFAULT_EVENT_MODE,
+    DEFAULT_BATCH_WINDOW,
+    EVENT_MODES,
+    CONF_PUSH_MODE,
+    CONF_WEBHOOK_ID,
+    DEFAULT_PUSH_MODE,
+    CONF_SIGNAL_DEADBAND,
+    CONF_SENSOR_HEARTBEAT,
+    DEFAULT_SIGNAL_DEADBAND,
+    DEFAULT_SENSOR_HEARTBEAT,
+    CONF_TRANSLITERATE,
+    CONF_MAX_SEGMENTS,
+    CONF_SEGMENT_OVERFLOW,
+    DEFAULT_TRANSLITERATE,
+    DEFAULT_MAX_SEGMENTS,
+    DEFAULT_SEGMENT_OVERFLOW,
+    SEGMENT_OVERFLOW_MODES,
+    CONF_WATCHDOG,
+    DEFAULT_WATCHDOG,
 )
 from .api import GammuGatewayApiClient
 
@@ -38,9 +72,21 @@ class GammuConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
             try:
                 await client.get_signal()
-                return self.async_create_entry(title="Gammu Gateway", data=user_input)
             except Exception:
                 errors["base"] = "cannot_connect"
+            else:
+                if not user_input.get(CONF_PUSH_MODE):
+                    return self.async_create_entry(title="Gammu Gateway", data=user_input)
+                # Il webhook id fa da segreto: il gateway deve conoscerlo per inviare SMS
+                webhook_id = webhook.async_generate_id()
+                return self.async_create_entry(
+                    title="Gammu Gateway",
+                    data={**user_input, CONF_WEBHOOK_ID: webhook_id},
+                    description="push",
+                    description_placeholders={
+                        "webhook_path": webhook.async_generate_path(webhook_id)
+                    },
+                )
 
         data_schema = vol.Schema({
             vol.Required(CONF_HOST): str,
@@ -50,9 +96,42 @@ class GammuConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             
             # Intervallo aggiornamento segnale (sensori)
             vol.Optional(CONF_SCAN_INTERVAL_SIGNAL, default=DEFAULT_SCAN_INTERVAL_SIGNAL): int,
+
+            # Variazione minima del segnale (dBm) da registrare e riscrittura forzata (secondi)
+            vol.Optional(CONF_SIGNAL_DEADBAND, default=DEFAULT_SIGNAL_DEADBAND): vol.All(vol.Coerce(int), vol.Range(min=0, max=20)),
+            vol.Optional(CONF_SENSOR_HEARTBEAT, default=DEFAULT_SENSOR_HEARTBEAT): vol.All(vol.Coerce(int), vol.Range(min=60)),
             
             # NUOVO: Intervallo controllo SMS (minimo 10 secondi)
             vol.Optional(CONF_SCAN_INTERVAL_SMS, default=DEFAULT_SCAN_INTERVAL_SMS): vol.All(vol.Coerce(int), vol.Range(min=10)),
+
+            # Coda di invio: SMS al minuto e invii contemporanei verso il modem
+            vol.Optional(CONF_SEND_RATE, default=DEFAULT_SEND_RATE): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(CONF_SEND_CONCURRENCY, default=DEFAULT_SEND_CONCURRENCY): vol.All(vol.Coerce(int), vol.Range(min=1, max=4)),
+
+            # Segmenti in invio: traslitterazione in GSM-7 e limite per messaggio (0 = nessun limite)
+            vol.Optional(CONF_TRANSLITERATE, default=DEFAULT_TRANSLITERATE): bool,
+            vol.Optional(CONF_MAX_SEGMENTS, default=DEFAULT_MAX_SEGMENTS): vol.All(vol.Coerce(int), vol.Range(min=0, max=255)),
+            vol.Optional(CONF_SEGMENT_OVERFLOW, default=DEFAULT_SEGMENT_OVERFLOW): vol.In(SEGMENT_OVERFLOW_MODES),
+
+            # Timeout di connessione e lettura verso il gateway (secondi)
+            vol.Optional(CONF_CONNECT_TIMEOUT, default=DEFAULT_CONNECT_TIMEOUT): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(CONF_READ_TIMEOUT, default=DEFAULT_READ_TIMEOUT): vol.All(vol.Coerce(int), vol.Range(min=1)),
+
+            # Peso del gateway quando sono configurati più modem
+            vol.Optional(CONF_WEIGHT, default=DEFAULT_WEIGHT): vol.All(vol.Coerce(int), vol.Range(min=1)),
+
+            # Attesa massima delle parti mancanti di un SMS multipart (secondi)
+            vol.Optional(CONF_REASSEMBLY_TIMEOUT, default=DEFAULT_REASSEMBLY_TIMEOUT): vol.All(vol.Coerce(int), vol.Range(min=5)),
+
+            # Eventi in ricezione: uno per SMS, uno per finestra (batch) o entrambi
+            vol.Optional(CONF_EVENT_MODE, default=DEFAULT_EVENT_MODE): vol.In(EVENT_MODES),
+            vol.Optional(CONF_BATCH_WINDOW, default=DEFAULT_BATCH_WINDOW): vol.All(vol.Coerce(int), vol.Range(min=1, max=60)),
+
+            # Ricezione in push via webhook (il polling /getsms diventa una rete di sicurezza lenta)
+            vol.Optional(CONF_PUSH_MODE, default=DEFAULT_PUSH_MODE): bool,
+
+            # Reset automatico del modem quando il gateway risulta bloccato
+            vol.Optional(CONF_WATCHDOG, default=DEFAULT_WATCHDOG): bool,
         })
 
         return self.async_show_form(
@@ -1,4 +1,5 @@
 """Costanti per l'integrazione SMS Gammu Gateway."""
+from datetime import timedelta
 
 DOMAIN = "gammu_gateway"
 
@@ -20,5 +21,152 @@ DEFAULT_PORT = 5000
 DEFAULT_SCAN_INTERVAL_SIGNAL = 30
 DEFAULT_SCAN_INTERVAL_SMS = 20 # Default come suggerito dal tuo esempio
 
+# Timeout (secondi) delle chiamate HTTP verso il gateway
+API_TIMEOUT = 10
+
+# Trasporto HTTP dedicato per gateway: timeout di connessione/lettura e pool keep-alive
+CONF_CONNECT_TIMEOUT = "connect_timeout"
+CONF_READ_TIMEOUT = "read_timeout"
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 10
+API_POOL_SIZE = 4
+API_KEEPALIVE_TIMEOUT = 30
+
+# Circuit breaker: errori consecutivi prima di aprire, attesa prima del probe,
+# probe riusciti necessari per richiudere
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RECOVERY_TIMEOUT = 30
+BREAKER_HALF_OPEN_SUCCESSES = 2
+
+# Timeout minimo (secondi) calcolato dalla latenza stimata di ogni endpoint
+ADAPTIVE_TIMEOUT_MIN = 2
+
+# Diagnostica: soglia (secondi) oltre cui una chiamata è "lenta" e campioni conservati
+SLOW_CALL_THRESHOLD = 2
+SLOW_CALL_SAMPLES = 20
+
 # Evento lanciato quando arriva un SMS
-EVENT_GAMMU_RECEIVED = "gammu_gateway_sms_received"
\ No newline at end of file
+EVENT_GAMMU_RECEIVED = "gammu_gateway_sms_received"
+
+# Evento con la lista degli SMS arrivati nella stessa finestra (modalità batch)
+EVENT_GAMMU_BATCH = "gammu_gateway_sms_batch"
+
+# Modalità eventi in ricezione: uno per SMS, uno per finestra, o entrambi
+CONF_EVENT_MODE = "event_mode"
+EVENT_MODE_SINGLE = "single"
+EVENT_MODE_BATCH = "batch"
+EVENT_MODE_BOTH = "both"
+EVENT_MODES = [EVENT_MODE_SINGLE, EVENT_MODE_BATCH, EVENT_MODE_BOTH]
+DEFAULT_EVENT_MODE = EVENT_MODE_SINGLE
+
+# Finestra (secondi) e dimensione massima di un batch
+CONF_BATCH_WINDOW = "batch_window"
+DEFAULT_BATCH_WINDOW = 2
+BATCH_MAX_SIZE = 100
+
+# Intervallo minimo (secondi) tra due log INFO di ricezione
+LOG_SUMMARY_INTERVAL = 30
+
+# Deduplica degli SMS ricevuti: impronte conservate e loro durata (secondi)
+DEDUPE_MAX_ENTRIES = 2000
+DEDUPE_TTL = 6 * 3600
+# SMS senza data: solo le ripetizioni ravvicinate (es. retry del webhook) sono duplicati
+DEDUPE_UNDATED_TTL = 60
+
+# SMS multipart: attesa massima (secondi) delle parti mancanti e messaggi in ricostruzione
+CONF_REASSEMBLY_TIMEOUT = "reassembly_timeout"
+DEFAULT_REASSEMBLY_TIMEOUT = 60
+REASSEMBLY_MAX_GROUPS = 50
+
+# Ricezione SMS: letture massime di /getsms per singolo ciclo di polling
+SMS_MAX_PER_POLL = 50
+
+# Intervallo minimo (secondi) usato mentre arrivano SMS
+SMS_MIN_POLL_INTERVAL = 2
+
+# Quando il gateway è inattivo l'intervallo cresce fino a scan_interval_sms * fattore
+SMS_IDLE_BACKOFF_FACTOR = 3
+
+# Coda di invio SMS: velocità massima (SMS al minuto) e invii contemporanei verso il modem
+CONF_SEND_RATE = "send_rate"
+CONF_SEND_CONCURRENCY = "send_concurrency"
+DEFAULT_SEND_RATE = 10
+DEFAULT_SEND_CONCURRENCY = 1
+
+# Peso del gateway nella distribuzione degli invii tra più modem
+CONF_WEIGHT = "weight"
+DEFAULT_WEIGHT = 1
+
+# Chiave in hass.data del pool condiviso tra tutte le config entry
+DATA_POOL = f"{DOMAIN}_pool"
+
+# Tentativi e back-off (secondi) per gli invii falliti
+SEND_MAX_ATTEMPTS = 5
+SEND_RETRY_BASE = 5
+SEND_RETRY_MAX = 300
+
+# Eventi lanciati al termine di un invio dalla coda
+EVENT_GAMMU_SENT = "gammu_gateway_sms_sent"
+EVENT_GAMMU_SEND_FAILED = "gammu_gateway_sms_failed"
+
+# Ricezione in push: gli SMS arrivano su un webhook, il polling resta come rete di sicurezza
+CONF_PUSH_MODE = "push_mode"
+CONF_WEBHOOK_ID = "webhook_id"
+DEFAULT_PUSH_MODE = False
+PUSH_SAFETY_POLL_INTERVAL = 300
+
+# Richieste contemporanee verso il modem (Gammu serializza sulla porta seriale)
+MODEM_CONCURRENCY = 1
+
+# Sensori segnale/rete: variazione minima (dBm) da scrivere e scrittura forzata ogni N secondi
+CONF_SIGNAL_DEADBAND = "signal_deadband"
+CONF_SENSOR_HEARTBEAT = "sensor_heartbeat"
+DEFAULT_SIGNAL_DEADBAND = 2
+DEFAULT_SENSOR_HEARTBEAT = 900
+
+# Pianificazione segmenti in invio: traslitterazione in GSM-7 e limite di segmenti per SMS
+CONF_TRANSLITERATE = "transliterate"
+CONF_MAX_SEGMENTS = "max_segments"
+CONF_SEGMENT_OVERFLOW = "segment_overflow"
+SEGMENT_OVERFLOW_REJECT = "reject"
+SEGMENT_OVERFLOW_TRUNCATE = "truncate"
+SEGMENT_OVERFLOW_MODES = [SEGMENT_OVERFLOW_REJECT, SEGMENT_OVERFLOW_TRUNCATE]
+DEFAULT_TRANSLITERATE = False
+DEFAULT_MAX_SEGMENTS = 0
+DEFAULT_SEGMENT_OVERFLOW = SEGMENT_OVERFLOW_REJECT
+
+# Polling adattivo di segnale e rete: intervallo minimo, crescita quando stabile e pausa massima con modem occupato
+STATUS_MIN_INTERVAL = 10
+STATUS_BACKOFF_FACTOR = 2
+STATUS_MAX_INTERVAL_FACTOR = 8
+STATUS_MAX_PAUSE = 300
+
+# Storico SMS (SQLite): retention, righe massime, scrittura a blocchi e compattazione
+DATA_HISTORY = f"{DOMAIN}_history"
+HISTORY_FILE = f"{DOMAIN}_history.db"
+HISTORY_RETENTION_DAYS = 90
+HISTORY_MAX_ROWS = 100000
+HISTORY_FLUSH_DELAY = 5
+HISTORY_FLUSH_MAX = 200
+HISTORY_COMPACT_INTERVAL = timedelta(hours=24)
+HISTORY_QUERY_MAX = 500
+
+# Comandi via SMS (configurazione YAML): regole, mittenti ammessi ed evento di default
+DATA_COMMANDS = f"{DOMAIN}_commands"
+CONF_COMMANDS = "commands"
+CONF_ALLOWED_SENDERS = "allowed_senders"
+EVENT_GAMMU_COMMAND = "gammu_gateway_command"
+
+# Watchdog del modem: reset automatico con cooldown e limite orario
+CONF_WATCHDOG = "watchdog"
+DEFAULT_WATCHDOG = True
+WATCHDOG_INTERVAL = timedelta(seconds=30)
+WATCHDOG_FAILURE_THRESHOLD = 5
+WATCHDOG_LATENCY_FACTOR = 5
+WATCHDOG_LATENCY_FLOOR = 5
+WATCHDOG_NETWORK_GRACE = 120
+WATCHDOG_SEND_FAILURES = 3
+WATCHDOG_SEND_WINDOW = 600
+WATCHDOG_COOLDOWN = 600
+WATCHDOG_MAX_RESETS_PER_HOUR = 3
+EVENT_GAMMU_MODEM_RESET = "gammu_gateway_modem_reset"
@@ -1,6 +1,9 @@
 from __future__ import annotations
 import asyncio
 import logging
+import time
+from datetime import timedelta
+from bisect import bisect_left, insort
 from typing import Any, Dict, Optional
 
 from aiohttp import BasicAuth, ClientError
@@ -10,13 +13,131 @@ from homeassistant.helpers.update_coordinator import (
     UpdateFailed,
 )
 
-from .const import API_TIMEOUT
+from .const import (
+    API_TIMEOUT,
+    EVENT_GAMMU_RECEIVED,
+    DEFAULT_SIGNAL_DEADBAND,
+    STATUS_MIN_INTERVAL,
+    STATUS_BACKOFF_FACTOR,
+    STATUS_MAX_INTERVAL_FACTOR,
+    STATUS_MAX_PAUSE,
+)
+from .models import CommandResult, NetworkInfo, SignalInfo, SmsMessage, decode_json
+from .scheduler import PRIORITY_RECEIVE, PRIORITY_SEND, PRIORITY_STATUS
 
 _LOGGER = logging.getLogger(__name__)
 
 
+class GammuStatusCoordinator(DataUpdateCoordinator):
+    """Polls /signal and /network with an adaptive interval.
+
+    While signal or registration is changing the interval drops to the
+    minimum; every stable poll multiplies it by STATUS_BACKOFF_FACTOR, up to
+    STATUS_MAX_INTERVAL_FACTOR times the configured interval. While
+    ``busy()`` reports modem work (sends, an inbound backlog, queued
+    requests) polls are skipped, for at most STATUS_MAX_PAUSE seconds.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client,
+        base_interval: int,
+        deadband: int = DEFAULT_SIGNAL_DEADBAND,
+        busy=None,
+    ) -> None:
+        super().__init__(
+            hass,
+            _LOGGER,
+            name="gammu_coordinator",
+            update_interval=timedelta(seconds=base_interval),
+        )
+        self._client = client
+        self._deadband = max(deadband, 1)
+        self._busy = busy
+        self._min_interval = min(base_interval, max(STATUS_MIN_INTERVAL, base_interval / 2))
+        self._max_interval = base_interval * STATUS_MAX_INTERVAL_FACTOR
+        self.interval = base_interval
+        self.polls = 0
+        self.paused = 0
+        self._last_poll: Optional[float] = None
+
+    async def _async_update_data(self) -> Dict[str, Any]:
+        """Fetch signal and network concurrently.
+
+        When one call fails the last good value is kept and flagged in
+        ``data["stale"]``; the update only fails when both calls fail.
+        """
+        previous = self.data or {}
+        now = time.monotonic()
+        if (
+            self.data is not None
+            and self._busy is not None
+            and self._busy()
+            and now - self._last_poll < STATUS_MAX_PAUSE
+        ):
+            # The modem has more urgent work: check again shortly without touching it
+            self.paused += 1
+            self.update_interval = timedelta(seconds=self._min_interval)
+            return self.data
+
+        self.polls += 1
+        self._last_poll = now
+        results = await asyncio.gather(
+            self._client.get_signal(), self._client.get_network(), return_exceptions=True
+        )
+
+        data = {"stale": {}}
+        errors = []
+        for key, result in zip(("signal", "network"), results):
+            if isinstance(result, BaseException):
+                errors.append(f"{key}: {result}")
+                data[key] = previous.get(key)
+                data["stale"][key] = True
+            else:
+                data[key] = result
+                data["stale"][key] = False
+
+        if len(errors) == len(results):
+            # Probe again soon so the sensors recover as soon as the gateway answers
+            self.interval = self._min_interval
+            self.update_interval = timedelta(seconds=self.interval)
+            raise UpdateFailed(f"Error updating signal/network: {'; '.join(errors)}")
+        if errors:
+            _LOGGER.warning("Partial update, keeping last known values: %s", "; ".join(errors))
+
+        if self._is_changing(previous, data):
+            self.interval = self._min_interval
+        else:
+            self.interval = min(self.interval * STATUS_BACKOFF_FACTOR, self._max_interval)
+        self.update_interval = timedelta(seconds=self.interval)
+        return data
+
+    def _is_changing(self, previous: dict, data: dict) -> bool:
+        """True when signal moved past the deadband or registration changed."""
+        if not previous or previous.get("stale") != data["stale"]:
+            return True
+        old_signal = previous["signal"].strength if previous.get("signal") else None
+        new_signal = data["signal"].strength if data.get("signal") else None
+        if (old_signal is None) != (new_signal is None):
+            return True
+        if old_signal is not None and abs(new_signal - old_signal) >= self._deadband:
+            return True
+        old_network = previous.get("network") or NetworkInfo()
+        new_network = data.get("network") or NetworkInfo()
+        return (old_network.state, old_network.code, old_network.name) != (
+            new_network.state, new_network.code, new_network.name
+        )
+
+
 class SmsGammuCoordinator(DataUpdateCoordinator):
-    """Communication handler for SMS Gammu API."""
+    """Communication handler for SMS Gammu API.
+
+    Not created by the integration setup: there, incoming SMS are read by
+    the /getsms poller or the push webhook, and the sensors use
+    GammuStatusCoordinator. This class is currently only exercised by
+    benchmarks/suite.py (coordinator refresh with a large /sms inbox).
+    """
 
     def __init__(
         self,
@@ -27,6 +148,8 @@ class SmsGammuCoordinator(DataUpdateCoordinator):
         username: str,
         password: str,
         update_interval: int,
+        inbound=None,
+        scheduler=None,
     ) -> None:
 
         super().__init__(
@@ -41,6 +164,11 @@ class SmsGammuCoordinator(DataUpdateCoordinator):
         self.port = port
         self.auth = BasicAuth(username, password)
         self._update_interval = int(update_interval)
+        # Shared receive path (dedupe + events) of the config entry, if any
+        self._inbound = inbound
+        # Per-gateway modem scheduler shared with the other callers, if any
+        self._scheduler = scheduler
+        self._loop_task: Optional[asyncio.Task] = None
 
         self.base_url = f"http://{self.host}:{self.port}"
 
@@ -49,53 +177,153 @@ class SmsGammuCoordinator(DataUpdateCoordinator):
             "network": None,
             "sms_list": [],
             "last_sms": None,
+            "new_sms": [],
+            "stale": {},
         }
 
+        # Incremental inbox sync state (see _sync_inbox)
+        self._seen: Dict[tuple, SmsMessage] = {}
+        self._index: list = []
+        self._synced = False
+
     async def _async_update_data(self) -> Dict[str, Any]:
-        """Fetch data from the SMS Gammu gateway."""
-        try:
-            signal = await self._get_json("/signal")
-            network = await self._get_json("/network")
-            sms_list = await self._get_json("/sms")
-
-            self.data["signal"] = signal or {}
-            self.data["network"] = network or {}
-            self.data["sms_list"] = sms_list or []
-
-            if self.data["sms_list"]:
-                try:
-                    self.data["last_sms"] = sorted(
-                        self.data["sms_list"],
-                        key=lambda x: x.get("Date", ""),
-                        reverse=True,
-                    )[0]
-                except Exception:
-                    self.data["last_sms"] = self.data["sms_list"][0]
+        """Fetch data from the SMS Gammu gateway.
+
+        The three endpoints are read concurrently. When one of them fails the
+        last good value is kept and flagged in ``data["stale"]``; the update
+        only fails when every endpoint failed.
+        """
+        results = await asyncio.gather(
+            self._get_json("/signal", PRIORITY_STATUS),
+            self._get_json("/network", PRIORITY_STATUS),
+            self._get_json("/sms", PRIORITY_RECEIVE),
+            return_exceptions=True,
+        )
+
+        stale = {}
+        for key, result in zip(("signal", "network", "sms_list"), results):
+            if result is None or isinstance(result, BaseException):
+                stale[key] = True
+                continue
+            try:
+                self.data[key] = self._MODELS[key](result)
+            except (TypeError, ValueError) as err:
+                _LOGGER.warning("Unexpected %s payload from gateway: %s", key, err)
+                stale[key] = True
             else:
-                self.data["last_sms"] = None
+                stale[key] = False
 
-            return self.data
+        if all(stale.values()):
+            raise UpdateFailed("Error updating SMS Gammu data: all endpoints failed")
+        self.data["stale"] = stale
+
+        if not stale["sms_list"]:
+            self.data["new_sms"] = self._sync_inbox(self.data["sms_list"])
+            self.data["last_sms"] = self._seen[self._index[-1][1]] if self._index else None
+            for sms in self.data["new_sms"]:
+                await self._async_received(sms)
+        else:
+            self.data["new_sms"] = []
+
+        return self.data
+
+    # Payload parsers of the three endpoints polled by _async_update_data
+    _MODELS = {
+        "signal": SignalInfo.from_response,
+        "network": NetworkInfo.from_response,
+        "sms_list": SmsMessage.list_from_response,
+    }
+
+    @staticmethod
+    def _sms_identity(sms: SmsMessage) -> tuple:
+        """Stable identity of an inbox message (SIM location when available)."""
+        date = str(sms.date or "")
+        if sms.location is not None:
+            return ("location", str(sms.location), date)
+        return (sms.sender, date, sms.text or "")
 
-        except Exception as err:
-            raise UpdateFailed(f"Error updating SMS Gammu data: {err}")
+    def _sync_inbox(self, sms_list: list) -> list:
+        """Apply the /sms listing to the local index and return only new messages.
 
-    async def _get_json(self, path: str) -> Optional[dict]:
-        """Perform authenticated GET request."""
+        ``_seen`` maps identities to messages and ``_index`` keeps
+        ``(Date, identity)`` pairs sorted, so the newest message is always
+        ``_index[-1]`` without re-sorting the whole inbox. The very first sync
+        only builds the baseline and reports no new messages.
+        """
+        current = {}
+        for sms in sms_list:
+            current[self._sms_identity(sms)] = sms
+
+        for identity in self._seen.keys() - current.keys():
+            key = (str(self._seen.pop(identity).date or ""), identity)
+            position = bisect_left(self._index, key)
+            if position < len(self._index) and self._index[position] == key:
+                del self._index[position]
+
+        new_sms = []
+        for identity, sms in current.items():
+            if identity in self._seen:
+                continue
+            self._seen[identity] = sms
+            insort(self._index, (str(sms.date or ""), identity))
+            new_sms.append(sms)
+
+        if not self._synced:
+            self._synced = True
+            return []
+        return new_sms
+
+    async def _async_received(self, sms: SmsMessage) -> None:
+        """Handle a message that just appeared in the inbox.
+
+        With a shared receive path the message goes through the same dedupe
+        cache as the /getsms poller, so overlapping reads fire a single event.
+        """
+        if self._inbound is not None:
+            await self._inbound.async_process(sms)
+            return
+        self.hass.bus.async_fire(EVENT_GAMMU_RECEIVED, sms.as_event())
+
+    async def _run(self, priority: int, func, key=None):
+        """Run a gateway call through the modem scheduler when one is set."""
+        if self._scheduler is None:
+            return await func()
+        return await self._scheduler.async_run(priority, func, key=key)
+
+    async def _get_json(self, path: str, priority: int = PRIORITY_STATUS) -> Any:
+        """Perform authenticated GET request; identical pending GETs are merged."""
+        return await self._run(priority, lambda: self._fetch_json(path), key=("GET", path))
+
+    async def _fetch_json(self, path: str) -> Any:
         url = f"{self.base_url}{path}"
         try:
             async with self.session.get(url, auth=self.auth, timeout=API_TIMEOUT) as resp:
                 if resp.status == 200:
-                    return await resp.json()
+                    return decode_json(await resp.read())
                 _LOGGER.warning("Gateway returned non-200 status for %s: %s", url, resp.status)
                 return None
         except ClientError as err:
             _LOGGER.error("Connection error calling %s: %s", url, err)
             return None
+        except ValueError as err:
+            _LOGGER.warning("Invalid JSON from %s: %s", url, err)
+            return None
 
     async def async_config_entry_first_refresh(self):
         """Initial refresh and start background polling."""
         await self._async_do_refresh_once()
-        self.hass.loop.create_task(self._background_loop())
+        self._loop_task = self.hass.loop.create_task(self._background_loop())
+
+    async def async_shutdown(self) -> None:
+        """Cancel the background loop (call from async_unload_entry)."""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        await super().async_shutdown()
 
     async def _async_do_refresh_once(self):
         try:
@@ -114,8 +342,11 @@ class SmsGammuCoordinator(DataUpdateCoordinator):
                 _LOGGER.error("Error in SMS Gammu update loop: %s", err)
             await asyncio.sleep(self._update_interval)
 
-    async def send_sms(self, number: str, text: str, smsc: str | None = None) -> dict:
-        """Send SMS via POST request using BasicAuth."""
+    async def send_sms(self, number: str, text: str, smsc: str | None = None) -> CommandResult:
+        """Send SMS via POST request using BasicAuth (ahead of any pending poll)."""
+        return await self._run(PRIORITY_SEND, lambda: self._post_sms(number, text, smsc))
+
+    async def _post_sms(self, number: str, text: str, smsc: str | None) -> CommandResult:
         url = f"{self.base_url}/sms"
         payload = {"number": number, "text": text}
         if smsc:
@@ -123,11 +354,7 @@ class SmsGammuCoordinator(DataUpdateCoordinator):
 
         try:
             async with self.session.post(url, json=payload, auth=self.auth, timeout=API_TIMEOUT) as resp:
-                try:
-                    data = await resp.json()
-                except Exception:
-                    data = await resp.text()
-                return {"status": resp.status, "response": data}
+                return CommandResult.from_response(resp.status, await resp.read())
         except ClientError as err:
             _LOGGER.error("Failed sending SMS: %s", err)
-            return {"status": "error", "error": str(err)}
+            return CommandResult("error", str(err))
@@ -0,0 +1,117 @@
+"""Cache LRU/TTL per scartare gli SMS ricevuti più volte."""
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, DEDUPE_MAX_ENTRIES, DEDUPE_TTL, DEDUPE_UNDATED_TTL
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+
+class SmsDedupeCache:
+    """Ricorda le impronte (mittente, data, hash del testo) degli SMS già visti.
+
+    Le impronte scadono dopo DEDUPE_TTL secondi e al massimo ne vengono
+    tenute DEDUPE_MAX_ENTRIES (le più vecchie escono per prime); la cache è
+    salvata nello storage di Home Assistant per sopravvivere ai riavvii.
+
+    Gli SMS senza data (possibili in push) non hanno un'impronta univoca:
+    due messaggi uguali dallo stesso mittente sarebbero indistinguibili per
+    ore. Per questi vale solo una finestra breve di DEDUPE_UNDATED_TTL
+    secondi dal primo avvistamento, in memoria.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id,
+        max_entries=DEDUPE_MAX_ENTRIES,
+        ttl=DEDUPE_TTL,
+        undated_ttl=DEDUPE_UNDATED_TTL,
+    ):
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.dedupe.{entry_id}")
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._undated_ttl = undated_ttl
+        self._entries = OrderedDict()
+        self._undated = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._loaded = False
+
+    def __len__(self):
+        return len(self._entries) + len(self._undated)
+
+    @staticmethod
+    def fingerprint(sender, date, text):
+        """Impronta compatta di un messaggio."""
+        text_hash = hashlib.sha1((text or "").encode("utf-8")).hexdigest()[:16]
+        return f"{sender}|{date}|{text_hash}"
+
+    async def async_load(self):
+        """Ripristina le impronte salvate ancora valide."""
+        stored = await self._store.async_load() or {}
+        limit = time.time() - self._ttl
+        for fingerprint, seen_at in stored.get("entries", []):
+            if seen_at >= limit:
+                self._entries[fingerprint] = seen_at
+        self._loaded = True
+
+    async def async_save(self):
+        # Prima del caricamento non sovrascriviamo le impronte salvate
+        if self._loaded:
+            await self._store.async_save(self._data_to_save())
+
+    @callback
+    def async_check(self, sender, date, text):
+        """Ritorna True se il messaggio è nuovo (e lo registra), False se è un duplicato."""
+        now = time.time()
+        if not date:
+            return self._check_undated(self.fingerprint(sender, None, text), now)
+        self._expire(self._entries, now - self._ttl)
+
+        fingerprint = self.fingerprint(sender, date, text)
+        if fingerprint in self._entries:
+            self.hits += 1
+            # Rinnoviamo la scadenza: l'ordine resta quello di ultimo avvistamento
+            self._entries.move_to_end(fingerprint)
+            self._entries[fingerprint] = now
+            return False
+
+        self.misses += 1
+        self._entries[fingerprint] = now
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+        return True
+
+    def _check_undated(self, fingerprint, now):
+        self._expire(self._undated, now - self._undated_ttl)
+        if fingerprint in self._undated:
+            # La scadenza non si rinnova: lo stesso testo ripetuto più tardi è un nuovo SMS
+            self.hits += 1
+            return False
+        self.misses += 1
+        self._undated[fingerprint] = now
+        while len(self._undated) > self._max_entries:
+            self._undated.popitem(last=False)
+        return True
+
+    @staticmethod
+    def _expire(entries, limit):
+        while entries:
+            fingerprint, seen_at = next(iter(entries.items()))
+            if seen_at >= limit:
+                break
+            entries.popitem(last=False)
+
+    @callback
+    def _data_to_save(self):
+        return {"entries": list(self._entries.items())}
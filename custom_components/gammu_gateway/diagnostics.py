@@ -0,0 +1,71 @@
+"""Diagnostica per l'integrazione SMS Gammu Gateway."""
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, CONF_WEBHOOK_ID, DATA_HISTORY
+from .models import JSON_BACKEND
+
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD, CONF_WEBHOOK_ID}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry):
+    """Ritorna contatori grezzi, chiamate lente e stato di coda e circuito."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    client = data["client"]
+    coordinator = data["coordinator"]
+    outbox = data["outbox"]
+    poller = data["sms_poller"]
+    push = data["push"]
+    history = hass.data.get(DATA_HISTORY)
+
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        # Secondi dall'inizio del setup: ritorno di async_setup_entry, servizi pronti, primo dato
+        "startup": data["startup"],
+        "api": client.stats.as_dict(),
+        "json_backend": JSON_BACKEND,
+        "breaker": {
+            "state": client.breaker.state,
+            "consecutive_failures": client.breaker.consecutive_failures,
+            "open_count": client.breaker.open_count,
+            "timeouts": {
+                endpoint: estimator.timeout for endpoint, estimator in client.latency.items()
+            },
+        },
+        "scheduler": client.scheduler.as_dict(),
+        "status_polling": {
+            "interval": coordinator.interval,
+            "polls": coordinator.polls,
+            "paused": coordinator.paused,
+        },
+        "outbox": {
+            "depth": outbox.depth,
+            "queued_segments": outbox.queued_segments,
+            "segments_sent": outbox.segments_sent,
+            "sent": outbox.sent_count,
+            "failed": outbox.failed_count,
+            "throughput": outbox.throughput,
+        },
+        "dedupe": {
+            "size": len(data["dedupe"]),
+            "hits": data["dedupe"].hits,
+            "misses": data["dedupe"].misses,
+        },
+        "reassembly_pending": len(data["inbound"].reassembler) if data["inbound"] else None,
+        "push": {
+            "received": push.received,
+            "rejected": push.rejected,
+        } if push else None,
+        "sensor_writes": data["sensor_writes"],
+        "commands": data["commands"].as_dict() if data["commands"] else None,
+        "watchdog": data["watchdog"].as_dict() if data["watchdog"] else None,
+        "history": {
+            "written": history.written,
+            "pending": history.pending,
+        } if history else None,
+        "sms_poller": {
+            "interval": poller.interval if poller else None,
+        },
+    }
@@ -0,0 +1,240 @@
+"""Storico locale (SQLite) degli SMS ricevuti e inviati."""
+import asyncio
+import logging
+import sqlite3
+import time
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
+
+from .const import (
+    HISTORY_RETENTION_DAYS,
+    HISTORY_MAX_ROWS,
+    HISTORY_FLUSH_DELAY,
+    HISTORY_FLUSH_MAX,
+    HISTORY_COMPACT_INTERVAL,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DIRECTION_IN = "in"
+DIRECTION_OUT = "out"
+
+COLUMNS = ("id", "ts", "direction", "gateway", "number", "text", "date", "status", "job_id", "segments")
+
+# Valore di PRAGMA auto_vacuum per la modalità INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts REAL NOT NULL,
+        direction TEXT NOT NULL,
+        gateway TEXT,
+        number TEXT,
+        text TEXT,
+        date TEXT,
+        status TEXT,
+        job_id TEXT,
+        segments INTEGER
+    )""",
+    "CREATE INDEX IF NOT EXISTS messages_number_ts ON messages (number, ts)",
+    "CREATE INDEX IF NOT EXISTS messages_ts ON messages (ts)",
+)
+
+
+class GammuSmsHistory:
+    """Storico append-only condiviso da tutti i gateway.
+
+    Le righe vengono raccolte in memoria e scritte a blocchi nel thread
+    executor (mai sull'event loop); le righe più vecchie di
+    HISTORY_RETENTION_DAYS giorni o oltre HISTORY_MAX_ROWS vengono rimosse
+    periodicamente e lo spazio liberato restituito al file.
+    """
+
+    def __init__(self, hass: HomeAssistant, path):
+        self._hass = hass
+        self._path = path
+        self._connection = None
+        # Una sola operazione alla volta sulla connessione (executor)
+        self._lock = asyncio.Lock()
+        self._pending = []
+        self._flush_unsub = None
+        self._compact_unsub = None
+        self.written = 0
+
+    @property
+    def pending(self):
+        """Righe non ancora scritte nel database."""
+        return len(self._pending)
+
+    @callback
+    def async_start(self):
+        """Avvia la compattazione periodica."""
+        self._compact_unsub = async_track_time_interval(
+            self._hass, self._async_compact, HISTORY_COMPACT_INTERVAL
+        )
+        self._hass.async_create_background_task(self._async_compact(), "gammu_gateway history compact")
+
+    async def async_stop(self):
+        """Scrive le righe in sospeso e chiude il database."""
+        if self._compact_unsub is not None:
+            self._compact_unsub()
+            self._compact_unsub = None
+        await self.async_flush()
+        async with self._lock:
+            if self._connection is not None:
+                await self._hass.async_add_executor_job(self._connection.close)
+                self._connection = None
+
+    @callback
+    def async_record_inbound(self, gateway, sms):
+        """Registra un SMS ricevuto (dati dell'evento, vedi SmsMessage.as_event)."""
+        self._async_append(
+            DIRECTION_IN, gateway, sms["sender"], sms["text"], sms["date"], "received", None,
+            sms.get("parts", 1),
+        )
+
+    @callback
+    def async_record_outbound(self, gateway, job, status):
+        """Registra l'esito (sent / failed) di un job della coda di invio."""
+        self._async_append(
+            DIRECTION_OUT, gateway, job["number"], job["message"], None, status, job["id"],
+            job.get("segments", 1),
+        )
+
+    async def async_query(self, number=None, direction=None, gateway=None, start=None, end=None, limit=50, cursor=None):
+        """Ritorna una pagina di messaggi (dal più recente) e il cursore della successiva.
+
+        Solleva ValueError se il cursore non è valido.
+        """
+        if cursor is not None:
+            cursor = _parse_cursor(cursor)
+        await self.async_flush()
+        async with self._lock:
+            return await self._hass.async_add_executor_job(
+                self._query, number, direction, gateway, start, end, limit, cursor
+            )
+
+    async def async_flush(self, _now=None):
+        """Scrive nel database le righe in sospeso."""
+        if self._flush_unsub is not None:
+            self._flush_unsub()
+            self._flush_unsub = None
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        async with self._lock:
+            try:
+                await self._hass.async_add_executor_job(self._insert, rows)
+            except sqlite3.Error as err:
+                _LOGGER.error("Scrittura dello storico SMS fallita (%d righe perse): %s", len(rows), err)
+                return
+        self.written += len(rows)
+
+    @callback
+    def _async_append(self, direction, gateway, number, text, date, status, job_id, segments):
+        self._pending.append(
+            (time.time(), direction, gateway, number, text, date, status, job_id, segments)
+        )
+        if len(self._pending) >= HISTORY_FLUSH_MAX:
+            self._hass.async_create_task(self.async_flush())
+        elif self._flush_unsub is None:
+            self._flush_unsub = async_call_later(self._hass, HISTORY_FLUSH_DELAY, self._async_flush_later)
+
+    @callback
+    def _async_flush_later(self, _now):
+        self._flush_unsub = None
+        self._hass.async_create_task(self.async_flush())
+
+    async def _async_compact(self, _now=None):
+        async with self._lock:
+            try:
+                removed = await self._hass.async_add_executor_job(self._compact)
+            except sqlite3.Error as err:
+                _LOGGER.warning("Compattazione dello storico SMS fallita: %s", err)
+                return
+        if removed:
+            _LOGGER.debug("Storico SMS: rimossi %d messaggi oltre la retention", removed)
+
+    # --- Metodi eseguiti nel thread executor ---
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self._path, check_same_thread=False)
+            # auto_vacuum va impostato prima di qualunque scrittura (anche il cambio di
+            # journal_mode crea l'intestazione del file), altrimenti resta NONE
+            connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            if connection.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                # Database creato senza auto_vacuum: la modalità si applica solo con un VACUUM (una volta)
+                _LOGGER.info("Conversione dello storico SMS ad auto_vacuum incrementale")
+                connection.execute("VACUUM")
+            connection.execute("PRAGMA journal_mode = WAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _insert(self, rows):
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                "INSERT INTO messages (ts, direction, gateway, number, text, date, status, job_id, segments)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def _query(self, number, direction, gateway, start, end, limit, cursor):
+        clauses, params = [], []
+        for column, value in (("number", number), ("direction", direction), ("gateway", gateway)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(end)
+        if cursor is not None:
+            # Paginazione per chiave (ts, id): stabile anche mentre arrivano nuovi messaggi
+            cursor_ts, cursor_id = cursor
+            clauses.append("(ts < ? OR (ts = ? AND id < ?))")
+            params.extend((cursor_ts, cursor_ts, cursor_id))
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM messages{where} ORDER BY ts DESC, id DESC LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+
+        messages = [dict(zip(COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = messages[-1]
+            next_cursor = f"{last['ts']!r}:{last['id']}"
+        return messages, next_cursor
+
+    def _compact(self):
+        connection = self._connect()
+        with connection:
+            cutoff = time.time() - HISTORY_RETENTION_DAYS * 86400
+            removed = connection.execute("DELETE FROM messages WHERE ts < ?", (cutoff,)).rowcount
+            removed += connection.execute(
+                "DELETE FROM messages WHERE id <= ("
+                " SELECT id FROM messages ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (HISTORY_MAX_ROWS,),
+            ).rowcount
+        if removed:
+            connection.execute("PRAGMA incremental_vacuum")
+        return removed
+
+
+def _parse_cursor(cursor):
+    """Converte il cursore testuale 'ts:id' restituito da async_query."""
+    cursor_ts, _, cursor_id = str(cursor).partition(":")
+    try:
+        return float(cursor_ts), int(cursor_id)
+    except ValueError as err:
+        raise ValueError(f"Cursore non valido: {cursor}") from err
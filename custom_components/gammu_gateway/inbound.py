@@ -0,0 +1,136 @@
+"""Gestione degli SMS ricevuti dal Gammu Gateway."""
+import logging
+import time
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    EVENT_GAMMU_RECEIVED,
+    EVENT_GAMMU_BATCH,
+    EVENT_MODE_SINGLE,
+    EVENT_MODE_BATCH,
+    BATCH_MAX_SIZE,
+    LOG_SUMMARY_INTERVAL,
+)
+from .reassembly import SmsReassembler, multipart_info
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class GammuSmsInbound:
+    """Percorso di ricezione: scarta i duplicati, ricompone i multipart e scatena l'evento.
+
+    In modalità batch gli SMS arrivati entro `batch_window` secondi vengono
+    raccolti in un unico evento gammu_gateway_sms_batch.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        dedupe,
+        reassembly_timeout,
+        event_mode=EVENT_MODE_SINGLE,
+        batch_window=0,
+        history=None,
+        gateway=None,
+        commands=None,
+    ):
+        self._hass = hass
+        self._history = history
+        self._commands = commands
+        self._gateway = gateway
+        self._dedupe = dedupe
+        self.reassembler = SmsReassembler(hass, self._async_fire, reassembly_timeout)
+        self._single_events = event_mode != EVENT_MODE_BATCH
+        self._batch_events = event_mode != EVENT_MODE_SINGLE
+        self._batch_window = batch_window
+        self._batch = []
+        self._batch_unsub = None
+        self._log_pending = 0
+        self._log_sender = None
+        self._log_last = 0.0
+        self._log_unsub = None
+
+    async def async_process(self, message):
+        """Elabora un SMS (SmsMessage) letto dal gateway, dalla lista /sms o dal webhook."""
+        sms = message.as_event()
+
+        if not self._dedupe.async_check(sms["sender"], sms["date"], sms["text"]):
+            _LOGGER.debug("SMS duplicato da %s ignorato", sms["sender"])
+            return
+
+        info = multipart_info(message)
+        if info is not None:
+            # Parte di un SMS concatenato: l'evento parte quando il messaggio è completo
+            await self.reassembler.async_add(sms, info)
+            return
+
+        await self._async_fire(sms)
+
+    async def async_stop(self):
+        """Emette gli SMS multipart ancora incompleti e l'eventuale batch in corso."""
+        await self.reassembler.async_flush_all()
+        self._async_flush_batch()
+        self._async_flush_log()
+
+    async def _async_fire(self, sms):
+        self._log_received(sms)
+        if self._history is not None:
+            self._history.async_record_inbound(self._gateway, sms)
+
+        # I comandi riconosciuti eseguono subito la loro azione, l'evento generico parte comunque
+        if self._commands is not None:
+            await self._commands.async_dispatch(sms)
+
+        # Scateniamo l'evento
+        if self._single_events:
+            self._hass.bus.async_fire(EVENT_GAMMU_RECEIVED, sms)
+
+        if self._batch_events:
+            self._batch.append(sms)
+            if len(self._batch) >= BATCH_MAX_SIZE:
+                self._async_flush_batch()
+            elif self._batch_unsub is None:
+                self._batch_unsub = async_call_later(
+                    self._hass, self._batch_window, self._async_flush_batch
+                )
+
+    @callback
+    def _async_flush_batch(self, _now=None):
+        if self._batch_unsub is not None:
+            self._batch_unsub()
+            self._batch_unsub = None
+        if not self._batch:
+            return
+        messages, self._batch = self._batch, []
+        self._hass.bus.async_fire(EVENT_GAMMU_BATCH, {
+            "count": len(messages),
+            "messages": messages,
+        })
+
+    def _log_received(self, sms):
+        """Log della ricezione: DEBUG per ogni SMS, INFO al massimo ogni LOG_SUMMARY_INTERVAL."""
+        _LOGGER.debug("Nuovo SMS ricevuto da %s: %s", sms["sender"], sms["text"])
+        self._log_pending += 1
+        self._log_sender = sms["sender"]
+        wait = self._log_last + LOG_SUMMARY_INTERVAL - time.monotonic()
+        if wait <= 0:
+            self._async_flush_log()
+        elif self._log_unsub is None:
+            # Il riepilogo parte alla fine della finestra, senza attendere il prossimo SMS
+            self._log_unsub = async_call_later(self._hass, wait, self._async_flush_log)
+
+    @callback
+    def _async_flush_log(self, _now=None):
+        if self._log_unsub is not None:
+            self._log_unsub()
+            self._log_unsub = None
+        if not self._log_pending:
+            return
+        if self._log_pending == 1:
+            _LOGGER.info("Nuovo SMS ricevuto da %s", self._log_sender)
+        else:
+            _LOGGER.info("Ricevuti %d nuovi SMS (ultimo da %s)", self._log_pending, self._log_sender)
+        self._log_pending = 0
+        self._log_last = time.monotonic()
@@ -0,0 +1,174 @@
+"""Modelli compatti delle risposte del Gammu Gateway."""
+import json
+
+try:
+    # orjson è già installato con Home Assistant; json resta come ripiego
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+# Stati di /network in cui il modem è registrato
+REGISTERED_STATES = ("HomeNetwork", "RoamingNetwork")
+
+
+def decode_json(body):
+    """Decodifica il corpo di una risposta; solleva ValueError se non è JSON."""
+    if orjson is not None:
+        # orjson.JSONDecodeError è una sottoclasse di ValueError
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _dict(payload, endpoint):
+    if not isinstance(payload, dict):
+        raise ValueError(f"Risposta di /{endpoint} non valida: {type(payload).__name__}")
+    return payload
+
+
+class SignalInfo:
+    """Risposta di /signal (intensità in dBm e percentuale)."""
+
+    __slots__ = ("strength", "percent", "bit_error_rate")
+
+    def __init__(self, strength=None, percent=None, bit_error_rate=None):
+        self.strength = strength
+        self.percent = percent
+        self.bit_error_rate = bit_error_rate
+
+    @classmethod
+    def from_response(cls, payload):
+        payload = _dict(payload, "signal")
+        return cls(
+            _int(payload.get("SignalStrength")),
+            _int(payload.get("SignalPercent")),
+            _int(payload.get("BitErrorRate")),
+        )
+
+    def as_dict(self):
+        return {
+            "SignalStrength": self.strength,
+            "SignalPercent": self.percent,
+            "BitErrorRate": self.bit_error_rate,
+        }
+
+
+class NetworkInfo:
+    """Risposta di /network (operatore, stato di registrazione, codice e cella)."""
+
+    __slots__ = ("name", "state", "code", "lac", "cid")
+
+    def __init__(self, name=None, state=None, code=None, lac=None, cid=None):
+        self.name = name
+        self.state = state
+        self.code = code
+        self.lac = lac
+        self.cid = cid
+
+    @classmethod
+    def from_response(cls, payload):
+        payload = _dict(payload, "network")
+        return cls(
+            payload.get("NetworkName"),
+            payload.get("State"),
+            payload.get("NetworkCode"),
+            payload.get("LAC"),
+            payload.get("CID"),
+        )
+
+    @property
+    def registered(self):
+        return self.state in REGISTERED_STATES
+
+    def as_dict(self):
+        return {
+            "NetworkName": self.name,
+            "State": self.state,
+            "NetworkCode": self.code,
+            "LAC": self.lac,
+            "CID": self.cid,
+        }
+
+
+class SmsMessage:
+    """SMS letto da /getsms, da /sms o ricevuto in push.
+
+    Le chiavi alternative del gateway (Number / Sender, Date / DateTime)
+    vengono risolte qui, una volta sola.
+    """
+
+    __slots__ = ("sender", "text", "date", "state", "udh", "location")
+
+    def __init__(self, sender, text, date=None, state=None, udh=None, location=None):
+        self.sender = sender
+        self.text = text
+        self.date = date
+        self.state = state
+        self.udh = udh
+        self.location = location
+
+    @classmethod
+    def from_dict(cls, data):
+        """Costruisce il messaggio da un SMS nel formato del gateway."""
+        return cls(
+            data.get("Number") or data.get("Sender") or "Unknown",
+            data.get("Text"),
+            data.get("Date") or data.get("DateTime"),
+            data.get("State"),
+            data.get("UDH"),
+            data.get("Location"),
+        )
+
+    @classmethod
+    def from_response(cls, payload):
+        """SMS di /getsms, o None se la coda del gateway è vuota."""
+        if not isinstance(payload, dict) or not payload.get("Text"):
+            return None
+        return cls.from_dict(payload)
+
+    @classmethod
+    def list_from_response(cls, payload):
+        """Lista di SMS (risposta di /sms o payload del webhook); ignora le voci senza testo."""
+        return [
+            cls.from_dict(item) for item in payload if isinstance(item, dict) and item.get("Text")
+        ]
+
+    def as_event(self):
+        """Dati dell'evento gammu_gateway_sms_received."""
+        return {
+            "sender": self.sender,
+            "text": self.text,
+            "date": self.date,
+            "state": self.state,
+        }
+
+
+class CommandResult:
+    """Esito di /sms e /reset (JSON {"status", "message"} o testo semplice)."""
+
+    __slots__ = ("status", "message")
+
+    def __init__(self, status, message=None):
+        self.status = status
+        self.message = message
+
+    @classmethod
+    def from_response(cls, http_status, body):
+        try:
+            payload = decode_json(body)
+        except ValueError:
+            return cls(http_status, body.decode(errors="replace"))
+        if isinstance(payload, dict):
+            return cls(payload.get("status", http_status), payload.get("message"))
+        return cls(http_status, payload)
+
+    def as_dict(self):
+        return {"status": self.status, "message": self.message}
@@ -1,31 +1,34 @@
 from __future__ import annotations
 
 from typing import Any
-from homeassistant.components.notify import BaseNotificationService
+from homeassistant.components.notify import ATTR_DATA, BaseNotificationService
 
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN
-from .coordinator import SmsGammuCoordinator
+from .const import DATA_POOL
+from .pool import GammuGatewayPool
 
 
 async def async_get_service(hass: HomeAssistant, config: ConfigType, discovery_info=None):
     """Return notification service."""
-    for entry_id, data in hass.data[DOMAIN].items():
-        return SmsGammuNotificationService(data["coordinator"])
-    return None
+    pool = hass.data.get(DATA_POOL)
+    if pool is None:
+        return None
+    return SmsGammuNotificationService(pool)
 
 
 class SmsGammuNotificationService(BaseNotificationService):
-    """SMS sending service."""
+    """SMS sending service spread across all configured gateways."""
 
-    def __init__(self, coordinator: SmsGammuCoordinator):
-        self.coordinator = coordinator
+    def __init__(self, pool: GammuGatewayPool):
+        self.pool = pool
 
     async def async_send_message(self, message: str = "", **kwargs: Any) -> None:
         targets = kwargs.get("target") or kwargs.get("targets")
         smsc = kwargs.get("smsc")
+        data = kwargs.get(ATTR_DATA) or {}
 
         if isinstance(targets, str):
             targets = [targets]
@@ -33,5 +36,16 @@ class SmsGammuNotificationService(BaseNotificationService):
         if not targets:
             return
 
+        # Jobs are queued immediately; each gateway's outbox paces the actual sends
         for number in targets:
-            await self.coordinator.send_sms(number=number, text=message, smsc=smsc)
+            try:
+                self.pool.async_enqueue(
+                    number,
+                    message,
+                    smsc=smsc,
+                    entry_id=data.get("gateway"),
+                    sticky=data.get("sticky", False),
+                )
+            except ValueError as err:
+                # Unknown gateway or message over the configured segment budget
+                raise HomeAssistantError(str(err)) from err
@@ -0,0 +1,308 @@
+"""Coda persistente degli SMS in uscita per il Gammu Gateway."""
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .api import GammuGatewayApiError, GammuGatewayCircuitOpenError, GammuGatewayTimeoutError
+from .const import (
+    DOMAIN,
+    EVENT_GAMMU_SENT,
+    EVENT_GAMMU_SEND_FAILED,
+    SEND_MAX_ATTEMPTS,
+    SEND_RETRY_BASE,
+    SEND_RETRY_MAX,
+    DEFAULT_SEGMENT_OVERFLOW,
+)
+from .segments import plan_message
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 1
+
+# Finestra (secondi) su cui calcolare il throughput
+THROUGHPUT_WINDOW = 60
+
+
+class GammuSmsOutbox:
+    """Accoda gli SMS e li invia al gateway rispettando velocità e concorrenza.
+
+    I job in attesa sono salvati nello storage di Home Assistant, così un
+    riavvio a metà di un invio massivo non perde i messaggi rimanenti.
+    Ogni SMS viene pianificato all'accodamento (codifica e segmenti) e un
+    messaggio di N segmenti occupa N slot della velocità di invio.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client,
+        entry_id,
+        rate,
+        concurrency,
+        failover=None,
+        transliterate=False,
+        max_segments=0,
+        segment_overflow=DEFAULT_SEGMENT_OVERFLOW,
+        history=None,
+    ):
+        self._hass = hass
+        self._history = history
+        self._failover = failover
+        self._client = client
+        self._entry_id = entry_id
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.outbox.{entry_id}")
+        self._spacing = 60 / rate if rate else 0
+        self._concurrency = max(1, int(concurrency))
+        self._transliterate = transliterate
+        self._max_segments = max_segments
+        self._segment_overflow = segment_overflow
+        self._jobs = {}
+        self._queue = asyncio.Queue()
+        self._retry_handles = {}
+        self._rate_lock = asyncio.Lock()
+        self._next_slot = 0.0
+        self._workers = []
+        self._listeners = []
+        self._loaded = False
+        self._sent_times = deque()
+        self.sent_count = 0
+        self.failed_count = 0
+        self.segments_sent = 0
+        # Istanti dei tentativi falliti dall'ultimo invio riuscito o scartato (per il watchdog)
+        self._error_times = deque()
+
+    @property
+    def depth(self):
+        """Numero di SMS in attesa di invio (compresi quelli in retry)."""
+        return len(self._jobs)
+
+    @property
+    def active(self):
+        """SMS pronti o in invio (esclusi quelli in attesa di un nuovo tentativo)."""
+        return len(self._jobs) - len(self._retry_handles)
+
+    @property
+    def queued_segments(self):
+        """Segmenti ancora da inviare."""
+        return sum(job.get("segments", 1) for job in self._jobs.values())
+
+    @property
+    def throughput(self):
+        """SMS inviati nell'ultimo minuto."""
+        self._prune_sent_times()
+        return len(self._sent_times)
+
+    def recent_errors(self, window):
+        """Istanti (monotonic) dei tentativi falliti negli ultimi window secondi, dal più vecchio."""
+        limit = time.monotonic() - window
+        while self._error_times and self._error_times[0] < limit:
+            self._error_times.popleft()
+        return list(self._error_times)
+
+    async def async_start(self):
+        """Ripristina i job salvati e avvia i worker di invio."""
+        stored = await self._store.async_load() or {}
+        now = time.time()
+        for job in stored.get("jobs", []):
+            self._jobs[job["id"]] = job
+            self._requeue(job, max(0, job.get("next_attempt", 0) - now))
+        self._loaded = True
+        if self._jobs:
+            _LOGGER.info("Ripristinati %d SMS in coda di invio", len(self._jobs))
+
+        for index in range(self._concurrency):
+            self._workers.append(
+                self._hass.async_create_background_task(
+                    self._async_worker(),
+                    f"{DOMAIN} outbox worker {self._entry_id} #{index}",
+                )
+            )
+
+    async def async_stop(self):
+        """Ferma i worker e salva subito i job ancora in coda."""
+        for worker in self._workers:
+            worker.cancel()
+        self._workers.clear()
+        for handle in self._retry_handles.values():
+            handle.cancel()
+        self._retry_handles.clear()
+        # Se i job salvati non sono mai stati caricati non sovrascriviamo lo storage
+        if self._loaded:
+            await self._store.async_save(self._data_to_save())
+
+    @callback
+    def async_enqueue(self, number, message, smsc=None, job_id=None, tried=None):
+        """Accoda un SMS e ritorna subito il job (con codifica e segmenti pianificati).
+
+        job_id e tried vengono passati dal pool quando un job viene spostato
+        da un altro gateway, così l'id resta lo stesso per tutta la sua vita.
+        Solleva ValueError se il messaggio supera il limite di segmenti.
+        """
+        plan = plan_message(
+            message,
+            allow_transliteration=self._transliterate,
+            max_segments=self._max_segments,
+            overflow=self._segment_overflow,
+        )
+        job = {
+            "id": job_id or uuid.uuid4().hex,
+            "number": number,
+            "message": plan["text"],
+            "encoding": plan["encoding"],
+            "segments": plan["segments"],
+            "transliterated": plan["transliterated"],
+            "truncated": plan["truncated"],
+            "smsc": smsc,
+            "tried": tried or [],
+            "attempts": 0,
+            "created": time.time(),
+            "next_attempt": 0,
+        }
+        self._jobs[job["id"]] = job
+        self._queue.put_nowait(job["id"])
+        self._async_changed()
+        return job
+
+    @callback
+    def async_add_listener(self, update_callback):
+        """Registra una callback chiamata ad ogni variazione della coda."""
+        self._listeners.append(update_callback)
+
+        def remove_listener():
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    async def _async_worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            await self._async_wait_slot(job.get("segments", 1))
+            await self._async_send(job)
+
+    async def _async_wait_slot(self, segments=1):
+        """Distanzia gli invii secondo la velocità configurata (uno slot per segmento)."""
+        async with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._spacing * max(1, segments)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _async_send(self, job):
+        job["attempts"] += 1
+        try:
+            await self._client.send_sms(job["number"], job["message"], smsc=job.get("smsc"))
+        except GammuGatewayCircuitOpenError:
+            if self._async_try_failover(job):
+                return
+            # Il gateway è già noto come irraggiungibile: non consumiamo un tentativo
+            job["attempts"] -= 1
+            self._requeue(job, max(self._client.breaker.retry_after, 1))
+            return
+        except Exception as err:
+            if isinstance(err, GammuGatewayApiError) and err.status is not None and 400 <= err.status < 500:
+                # Richiesta rifiutata dal gateway (numero o testo non validi, credenziali):
+                # ripetere l'invio o spostarlo su un altro gateway darebbe lo stesso esito
+                self._async_fail(job, err)
+                self._async_changed()
+                return
+            self._error_times.append(time.monotonic())
+            # Dopo un timeout l'SMS potrebbe essere già partito: su un altro modem arriverebbe doppio
+            if not isinstance(err, GammuGatewayTimeoutError) and self._async_try_failover(job):
+                return
+            if job["attempts"] >= SEND_MAX_ATTEMPTS:
+                self._async_fail(job, err)
+            else:
+                delay = min(SEND_RETRY_BASE * 2 ** (job["attempts"] - 1), SEND_RETRY_MAX)
+                job["next_attempt"] = time.time() + delay
+                _LOGGER.warning(
+                    "Invio SMS a %s fallito (tentativo %d), nuovo tentativo tra %ds: %s",
+                    job["number"], job["attempts"], delay, err,
+                )
+                self._requeue(job, delay)
+            self._async_changed()
+            return
+
+        self._jobs.pop(job["id"], None)
+        self.sent_count += 1
+        self._error_times.clear()
+        self.segments_sent += job.get("segments", 1)
+        self._sent_times.append(time.monotonic())
+        _LOGGER.debug("SMS inviato a %s (job %s)", job["number"], job["id"])
+        self._hass.bus.async_fire(EVENT_GAMMU_SENT, {
+            "job_id": job["id"],
+            "number": job["number"],
+            "attempts": job["attempts"],
+            "segments": job.get("segments", 1),
+            "gateway": self._entry_id,
+        })
+        if self._history is not None:
+            self._history.async_record_outbound(self._entry_id, job, "sent")
+        self._async_changed()
+
+    @callback
+    def _async_fail(self, job, err):
+        """Scarta il job come non inviabile e lo notifica."""
+        self._jobs.pop(job["id"], None)
+        # I tentativi falliti del job scartato non indicano più un modem bloccato
+        self._error_times.clear()
+        self.failed_count += 1
+        _LOGGER.error(
+            "Impossibile inviare SMS a %s dopo %d tentativi: %s",
+            job["number"], job["attempts"], err,
+        )
+        self._hass.bus.async_fire(EVENT_GAMMU_SEND_FAILED, {
+            "job_id": job["id"],
+            "number": job["number"],
+            "attempts": job["attempts"],
+            "segments": job.get("segments", 1),
+            "gateway": self._entry_id,
+            "error": str(err),
+        })
+        if self._history is not None:
+            self._history.async_record_outbound(self._entry_id, job, "failed")
+
+    @callback
+    def _async_try_failover(self, job):
+        """Prova a spostare il job su un altro gateway del pool."""
+        if self._failover is None or not self._failover(job, self._entry_id):
+            return False
+        self._jobs.pop(job["id"], None)
+        self._async_changed()
+        return True
+
+    def _requeue(self, job, delay):
+        if delay <= 0:
+            self._queue.put_nowait(job["id"])
+            return
+
+        def _retry():
+            self._retry_handles.pop(job["id"], None)
+            self._queue.put_nowait(job["id"])
+
+        self._retry_handles[job["id"]] = self._hass.loop.call_later(delay, _retry)
+
+    def _prune_sent_times(self):
+        limit = time.monotonic() - THROUGHPUT_WINDOW
+        while self._sent_times and self._sent_times[0] < limit:
+            self._sent_times.popleft()
+
+    @callback
+    def _async_changed(self):
+        if self._loaded:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def _data_to_save(self):
+        return {"jobs": list(self._jobs.values())}
@@ -0,0 +1,122 @@
+"""Pool dei gateway configurati per distribuire gli invii tra più modem."""
+import logging
+from collections import OrderedDict
+
+from homeassistant.core import HomeAssistant, callback
+
+from .breaker import STATE_OPEN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Numero massimo di destinatari ricordati per l'instradamento "sticky"
+STICKY_MAX_ENTRIES = 1000
+
+
+class GammuGatewayPool:
+    """Sceglie il gateway per ogni invio e sposta i job quando un modem fallisce.
+
+    Il gateway scelto è quello sano con meno segmenti in coda rispetto al suo peso;
+    con sticky=True un destinatario resta sullo stesso modem finché è sano.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self._hass = hass
+        self._members = {}
+        self._sticky = OrderedDict()
+
+    def __len__(self):
+        return len(self._members)
+
+    @callback
+    def async_add(self, entry_id, client, outbox, weight=1):
+        """Aggiunge un gateway al pool."""
+        self._members[entry_id] = {
+            "client": client,
+            "outbox": outbox,
+            "weight": max(1, weight),
+        }
+
+    @callback
+    def async_remove(self, entry_id):
+        """Rimuove un gateway dal pool."""
+        self._members.pop(entry_id, None)
+        for number in [n for n, target in self._sticky.items() if target == entry_id]:
+            del self._sticky[number]
+
+    def is_healthy(self, entry_id):
+        return self._members[entry_id]["client"].breaker.state != STATE_OPEN
+
+    def _load(self, entry_id):
+        member = self._members[entry_id]
+        return member["outbox"].queued_segments / member["weight"]
+
+    @callback
+    def async_select(self, number, exclude=(), sticky=False):
+        """Ritorna l'entry_id del gateway a cui inviare (None se non ce ne sono)."""
+        candidates = [entry_id for entry_id in self._members if entry_id not in exclude]
+        healthy = [entry_id for entry_id in candidates if self.is_healthy(entry_id)]
+        if not healthy:
+            # Nessun gateway sano: la coda locale riproverà più tardi
+            healthy = candidates
+        if not healthy:
+            return None
+
+        if sticky:
+            target = self._sticky.get(number)
+            if target in healthy:
+                self._sticky.move_to_end(number)
+                return target
+
+        target = min(healthy, key=self._load)
+        if sticky:
+            self._sticky[number] = target
+            self._sticky.move_to_end(number)
+            if len(self._sticky) > STICKY_MAX_ENTRIES:
+                self._sticky.popitem(last=False)
+        return target
+
+    @callback
+    def async_enqueue(self, number, message, smsc=None, entry_id=None, sticky=False):
+        """Accoda un SMS sul gateway indicato o su quello scelto dal pool.
+
+        Ritorna (job, entry_id); solleva ValueError se il gateway non esiste
+        o il messaggio supera il limite di segmenti.
+        """
+        if entry_id is None:
+            entry_id = self.async_select(number, sticky=sticky)
+        if entry_id not in self._members:
+            raise ValueError(f"Gateway non disponibile: {entry_id}")
+        job = self._members[entry_id]["outbox"].async_enqueue(number, message, smsc=smsc)
+        return job, entry_id
+
+    @callback
+    def async_failover(self, job, entry_id):
+        """Sposta un job fallito su un altro gateway non ancora provato.
+
+        Ritorna True se il job è stato accodato altrove.
+        """
+        tried = list(job.get("tried", [])) + [entry_id]
+        candidates = [
+            other for other in self._members
+            if other not in tried and self.is_healthy(other)
+        ]
+        if not candidates:
+            return False
+
+        target = min(candidates, key=self._load)
+        try:
+            self._members[target]["outbox"].async_enqueue(
+                job["number"], job["message"], smsc=job.get("smsc"), job_id=job["id"], tried=tried
+            )
+        except ValueError as err:
+            # Il gateway scelto ha un limite di segmenti più stretto
+            _LOGGER.debug("Spostamento sul gateway %s non possibile: %s", target, err)
+            return False
+        for number, sticky_target in self._sticky.items():
+            if number == job["number"] and sticky_target == entry_id:
+                self._sticky[number] = target
+        _LOGGER.warning(
+            "Invio SMS a %s fallito sul gateway %s, spostato sul gateway %s",
+            job["number"], entry_id, target,
+        )
+        return True
@@ -0,0 +1,78 @@
+"""Ricezione SMS in modalità push tramite un webhook di Home Assistant."""
+import logging
+
+from aiohttp import web
+
+from homeassistant.components import webhook
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN
+from .models import SmsMessage
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _extract_messages(payload):
+    """Accetta un SMS, una lista di SMS o {"messages": [...]}, nel formato di /getsms."""
+    if isinstance(payload, dict) and isinstance(payload.get("messages"), list):
+        payload = payload["messages"]
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list):
+        return None
+    return SmsMessage.list_from_response(payload)
+
+
+class GammuSmsWebhook:
+    """Webhook su cui il gateway (o un forwarder) invia gli SMS appena ricevuti.
+
+    Gli SMS seguono lo stesso percorso di quelli letti da /getsms (dedupe,
+    multipart, eventi), quindi un messaggio ricevuto sia in push sia dal
+    polling di sicurezza genera un solo evento.
+    """
+
+    def __init__(self, hass: HomeAssistant, webhook_id, on_sms):
+        self._hass = hass
+        self._webhook_id = webhook_id
+        self._on_sms = on_sms
+        self.received = 0
+        self.rejected = 0
+
+    @property
+    def path(self):
+        """Percorso locale del webhook (/api/webhook/<id>)."""
+        return webhook.async_generate_path(self._webhook_id)
+
+    @callback
+    def async_register(self):
+        webhook.async_register(
+            self._hass,
+            DOMAIN,
+            "SMS Gammu Gateway",
+            self._webhook_id,
+            self._async_handle,
+            local_only=True,
+            allowed_methods=["POST"],
+        )
+        _LOGGER.info("Ricezione SMS in push attiva su %s", self.path)
+
+    @callback
+    def async_unregister(self):
+        webhook.async_unregister(self._hass, self._webhook_id)
+
+    async def _async_handle(self, hass, webhook_id, request):
+        try:
+            payload = await request.json()
+        except ValueError:
+            payload = None
+
+        messages = _extract_messages(payload)
+        if messages is None:
+            self.rejected += 1
+            _LOGGER.warning("Webhook SMS: payload non valido")
+            return web.json_response({"error": "invalid payload"}, status=400)
+
+        for message in messages:
+            await self._on_sms(message)
+        self.received += len(messages)
+        return web.json_response({"received": len(messages)})
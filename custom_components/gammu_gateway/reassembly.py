@@ -0,0 +1,103 @@
+"""Ricostruzione degli SMS concatenati (multipart) ricevuti a pezzi."""
+import logging
+import time
+from functools import partial
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import REASSEMBLY_MAX_GROUPS
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def multipart_info(message):
+    """Ritorna (riferimento, parte, totale) se l'SMS è una parte di un concatenato.
+
+    Gammu descrive i concatenati nella UDH: ID8bit / ID16bit sono il
+    riferimento comune, PartNumber e AllParts la posizione.
+    """
+    udh = message.udh
+    if not isinstance(udh, dict):
+        return None
+    reference = udh.get("ID16bit", -1)
+    if reference is None or reference < 0:
+        reference = udh.get("ID8bit", -1)
+    part = udh.get("PartNumber", -1)
+    total = udh.get("AllParts", -1)
+    if reference is None or part is None or total is None:
+        return None
+    if reference < 0 or total <= 1 or not 1 <= part <= total:
+        return None
+    return reference, part, total
+
+
+class SmsReassembler:
+    """Accumula le parti per riferimento ed emette un solo SMS completo.
+
+    Se mancano parti dopo `timeout` secondi emette quanto ricevuto con
+    partial=True; al massimo `max_groups` messaggi restano in attesa, oltre
+    viene emesso il più vecchio.
+    """
+
+    def __init__(self, hass: HomeAssistant, on_complete, timeout, max_groups=REASSEMBLY_MAX_GROUPS):
+        self._hass = hass
+        self._on_complete = on_complete
+        self._timeout = timeout
+        self._max_groups = max_groups
+        self._groups = {}
+
+    def __len__(self):
+        return len(self._groups)
+
+    async def async_add(self, sms, info):
+        """Aggiunge una parte (sms già normalizzato, info da multipart_info)."""
+        reference, part, total = info
+        key = (sms["sender"], reference, total)
+
+        group = self._groups.get(key)
+        if group is None:
+            if len(self._groups) >= self._max_groups:
+                oldest = min(self._groups, key=lambda k: self._groups[k]["started"])
+                _LOGGER.warning("Troppi SMS multipart in attesa, emesso il più vecchio incompleto")
+                await self._async_flush(oldest)
+            group = self._groups[key] = {
+                "parts": {},
+                "total": total,
+                "started": time.monotonic(),
+                "unsub": async_call_later(
+                    self._hass, self._timeout, partial(self._async_expire, key)
+                ),
+            }
+
+        group["parts"][part] = sms
+        if len(group["parts"]) == total:
+            await self._async_flush(key)
+
+    async def async_flush_all(self):
+        """Emette tutti i messaggi incompleti (usato all'unload)."""
+        for key in list(self._groups):
+            await self._async_flush(key)
+
+    @callback
+    def _async_expire(self, key, _now):
+        if key in self._groups:
+            _LOGGER.debug("Timeout ricostruzione SMS multipart da %s", key[0])
+            self._hass.async_create_task(self._async_flush(key))
+
+    async def _async_flush(self, key):
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+        group["unsub"]()
+
+        parts = group["parts"]
+        numbers = sorted(parts)
+        merged = dict(parts[numbers[0]])
+        merged["text"] = "".join(parts[number]["text"] or "" for number in numbers)
+        merged["parts"] = group["total"]
+        missing = [n for n in range(1, group["total"] + 1) if n not in parts]
+        if missing:
+            merged["partial"] = True
+            merged["missing_parts"] = missing
+        await self._on_complete(merged)
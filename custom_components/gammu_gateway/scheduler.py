@@ -0,0 +1,166 @@
+"""Accesso al modem ordinato per priorità, uno per gateway."""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from .const import MODEM_CONCURRENCY
+
+_LOGGER = logging.getLogger(__name__)
+
+# Priorità (numero più basso = servito prima)
+PRIORITY_SEND = 0
+PRIORITY_RECEIVE = 1
+PRIORITY_STATUS = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_SEND: "send",
+    PRIORITY_RECEIVE: "receive",
+    PRIORITY_STATUS: "status",
+}
+
+
+class _ModemRequest:
+    __slots__ = ("priority", "seq", "func", "key", "future", "waiters", "started", "queued_at")
+
+    def __init__(self, priority, seq, func, key, future):
+        self.priority = priority
+        self.seq = seq
+        self.func = func
+        self.key = key
+        self.future = future
+        self.waiters = 0
+        self.started = False
+        self.queued_at = time.monotonic()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class ModemScheduler:
+    """Serializza le chiamate verso il modem e le serve per priorità.
+
+    Gammu usa una sola porta seriale: al massimo `concurrency` richieste
+    sono in corso, le altre aspettano in coda (prima gli invii, poi la
+    ricezione, infine segnale e rete). Le richieste in attesa con la stessa
+    `key` vengono unite e ricevono lo stesso risultato. async_stop()
+    annulla le richieste in coda e quelle in corso.
+    """
+
+    def __init__(self, name, concurrency=MODEM_CONCURRENCY):
+        self._name = name
+        self._concurrency = concurrency
+        self._queue = []
+        self._pending = {}
+        self._running = set()
+        self._seq = itertools.count()
+        self._closed = False
+        self.completed = 0
+        self.merged = 0
+        self.max_wait = 0.0
+
+    @property
+    def depth(self):
+        """Richieste in attesa del modem."""
+        return sum(1 for request in self._queue if not request.future.done())
+
+    async def async_run(self, priority, func, key=None):
+        """Esegue func() (coroutine function) quando il modem è libero."""
+        if self._closed:
+            raise asyncio.CancelledError
+
+        request = self._pending.get(key) if key is not None else None
+        if request is not None:
+            self.merged += 1
+        else:
+            loop = asyncio.get_running_loop()
+            request = _ModemRequest(priority, next(self._seq), func, key, loop.create_future())
+            # Segniamo l'eccezione come letta anche se tutti i chiamanti sono stati annullati
+            request.future.add_done_callback(_consume_exception)
+            heapq.heappush(self._queue, request)
+            if key is not None:
+                self._pending[key] = request
+            self._dispatch()
+
+        request.waiters += 1
+        try:
+            # shield: l'annullamento di un chiamante non deve annullare gli altri uniti
+            return await asyncio.shield(request.future)
+        except asyncio.CancelledError:
+            request.waiters -= 1
+            if not request.waiters and not request.started:
+                # Nessuno aspetta più la richiesta: non la mandiamo al modem
+                request.future.cancel()
+                self._forget(request)
+            raise
+
+    async def async_stop(self):
+        """Annulla le richieste in coda e attende la fine di quelle in corso."""
+        self._closed = True
+        while self._queue:
+            heapq.heappop(self._queue).future.cancel()
+        self._pending.clear()
+        for task in self._running:
+            task.cancel()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def as_dict(self):
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for request in self._queue:
+            if not request.future.done():
+                queued[PRIORITY_NAMES.get(request.priority, str(request.priority))] += 1
+        return {
+            "queued": queued,
+            "running": len(self._running),
+            "completed": self.completed,
+            "merged": self.merged,
+            "max_wait": round(self.max_wait, 3),
+        }
+
+    def _forget(self, request):
+        if request.key is not None and self._pending.get(request.key) is request:
+            del self._pending[request.key]
+
+    def _dispatch(self):
+        while self._queue and len(self._running) < self._concurrency:
+            request = heapq.heappop(self._queue)
+            if request.future.done():
+                continue
+            self._forget(request)
+            request.started = True
+            wait = time.monotonic() - request.queued_at
+            self.max_wait = max(self.max_wait, wait)
+            if wait > 1:
+                _LOGGER.debug(
+                    "%s: richiesta %s servita dopo %.1fs di attesa",
+                    self._name, PRIORITY_NAMES.get(request.priority), wait,
+                )
+            task = asyncio.get_running_loop().create_task(self._execute(request))
+            self._running.add(task)
+            task.add_done_callback(self._on_done)
+
+    async def _execute(self, request):
+        try:
+            result = await request.func()
+        except asyncio.CancelledError:
+            request.future.cancel()
+            raise
+        except Exception as err:
+            if not request.future.done():
+                request.future.set_exception(err)
+        else:
+            if not request.future.done():
+                request.future.set_result(result)
+
+    def _on_done(self, task):
+        self._running.discard(task)
+        self.completed += 1
+        if not self._closed:
+            self._dispatch()
+
+
+def _consume_exception(future):
+    if not future.cancelled():
+        future.exception()
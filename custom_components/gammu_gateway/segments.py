@@ -0,0 +1,142 @@
+"""Calcolo di codifica e segmenti degli SMS in uscita (GSM-7 / UCS-2)."""
+import unicodedata
+
+from .const import SEGMENT_OVERFLOW_TRUNCATE
+
+ENCODING_GSM7 = "gsm7"
+ENCODING_UCS2 = "ucs2"
+
+# Alfabeto GSM 03.38 di base (un settetto per carattere)
+GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Tabella di estensione: ogni carattere occupa due settetti (ESC + carattere)
+GSM7_EXTENDED = frozenset("\f^{}\\[~]|€")
+
+# Limiti in unità (settetti o code unit UTF-16) per SMS singolo e per parte di un concatenato
+LIMITS = {
+    ENCODING_GSM7: (160, 153),
+    ENCODING_UCS2: (70, 67),
+}
+
+# Sostituzioni per i caratteri più comuni fuori dall'alfabeto GSM
+TRANSLITERATIONS = {
+    "‘": "'", "’": "'", "‚": "'", "′": "'", "´": "'", "`": "'",
+    "“": '"', "”": '"', "„": '"', "″": '"', "«": '"', "»": '"',
+    "–": "-", "—": "-", "‐": "-", "−": "-",
+    "…": "...", "•": "*", "·": ".",
+    "\u00a0": " ", "\u202f": " ", "\u200b": "",
+    "\t": " ", "ç": "Ç", "ı": "i", "ł": "l", "Ł": "L", "œ": "oe", "Œ": "OE",
+}
+
+
+def _char_units(char, encoding):
+    if encoding == ENCODING_GSM7:
+        return 2 if char in GSM7_EXTENDED else 1
+    # UCS-2 / UTF-16: i caratteri fuori dal BMP (es. emoji) usano due code unit
+    return 2 if ord(char) > 0xFFFF else 1
+
+
+def detect_encoding(text):
+    """GSM-7 se tutti i caratteri sono nell'alfabeto GSM, altrimenti UCS-2."""
+    for char in text:
+        if char not in GSM7_BASIC and char not in GSM7_EXTENDED:
+            return ENCODING_UCS2
+    return ENCODING_GSM7
+
+
+def count_segments(text, encoding=None):
+    """Ritorna (segmenti, unità) del testo nella codifica indicata (o rilevata)."""
+    encoding = encoding or detect_encoding(text)
+    single, multi = LIMITS[encoding]
+    units = [_char_units(char, encoding) for char in text]
+    total = sum(units)
+    if total <= single:
+        return (1 if text else 0), total
+
+    # Un carattere di due unità non può essere spezzato tra due parti
+    segments, used = 1, 0
+    for size in units:
+        if used + size > multi:
+            segments += 1
+            used = 0
+        used += size
+    return segments, total
+
+
+def transliterate(text):
+    """Sostituisce i caratteri fuori dall'alfabeto GSM con equivalenti GSM, dove esistono."""
+    result = []
+    for char in text:
+        if char in GSM7_BASIC or char in GSM7_EXTENDED:
+            result.append(char)
+            continue
+        if char in TRANSLITERATIONS:
+            result.append(TRANSLITERATIONS[char])
+            continue
+        # Lettere accentate: togliamo i diacritici (á -> a) se il risultato è GSM
+        stripped = "".join(
+            c for c in unicodedata.normalize("NFKD", char) if not unicodedata.combining(c)
+        )
+        if stripped and all(c in GSM7_BASIC or c in GSM7_EXTENDED for c in stripped):
+            result.append(stripped)
+        else:
+            result.append(char)
+    return "".join(result)
+
+
+def _truncate(text, encoding, max_segments):
+    single, multi = LIMITS[encoding]
+    budget = single if max_segments == 1 else multi * max_segments
+    used = 0
+    for index, char in enumerate(text):
+        used += _char_units(char, encoding)
+        if used > budget:
+            text = text[:index]
+            break
+    # Con più parti i caratteri di due unità possono far sforare di un segmento
+    while text and count_segments(text, encoding)[0] > max_segments:
+        text = text[:-1]
+    return text
+
+
+def plan_message(text, allow_transliteration=False, max_segments=0, overflow=None):
+    """Sceglie codifica e testo da inviare e calcola i segmenti.
+
+    Con allow_transliteration il testo viene convertito in GSM-7 solo se
+    così servono meno segmenti. Con max_segments > 0 un messaggio più
+    lungo viene troncato (overflow="truncate") o rifiutato con ValueError.
+    """
+    text = text or ""
+    encoding = detect_encoding(text)
+    segments, units = count_segments(text, encoding)
+    transliterated = False
+
+    if allow_transliteration and encoding == ENCODING_UCS2:
+        candidate = transliterate(text)
+        if detect_encoding(candidate) == ENCODING_GSM7:
+            candidate_segments, candidate_units = count_segments(candidate, ENCODING_GSM7)
+            if candidate_segments < segments:
+                text, encoding = candidate, ENCODING_GSM7
+                segments, units = candidate_segments, candidate_units
+                transliterated = True
+
+    truncated = False
+    if max_segments and segments > max_segments:
+        if overflow != SEGMENT_OVERFLOW_TRUNCATE:
+            raise ValueError(
+                f"Messaggio di {segments} segmenti ({encoding}), massimo consentito {max_segments}"
+            )
+        text = _truncate(text, encoding, max_segments)
+        segments, units = count_segments(text, encoding)
+        truncated = True
+
+    return {
+        "text": text,
+        "encoding": encoding,
+        "segments": segments,
+        "units": units,
+        "transliterated": transliterated,
+        "truncated": truncated,
+    }
@@ -1,24 +1,81 @@
 """Piattaforma Sensori per Gammu Gateway."""
-from homeassistant.components.sensor import SensorEntity, SensorDeviceClass, SensorStateClass
+import time
+from datetime import timedelta
+
+from homeassistant.components.sensor import (
+    RestoreSensor,
+    SensorEntity,
+    SensorDeviceClass,
+    SensorStateClass,
+)
+from homeassistant.core import callback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
-from homeassistant.const import SIGNAL_STRENGTH_DECIBELS_MILLIWATT
+from homeassistant.const import (
+    SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
+    EntityCategory,
+    UnitOfTime,
+)
+
+from .breaker import STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN
+from .watchdog import STATUSES as WATCHDOG_STATUSES
+from .const import (
+    DOMAIN,
+    CONF_HOST,
+    CONF_SIGNAL_DEADBAND,
+    CONF_SENSOR_HEARTBEAT,
+    DEFAULT_SIGNAL_DEADBAND,
+    DEFAULT_SENSOR_HEARTBEAT,
+)
 
-from .const import DOMAIN, CONF_HOST
+# Intervallo di aggiornamento dei sensori diagnostici a polling
+SCAN_INTERVAL = timedelta(seconds=60)
 
 async def async_setup_entry(hass, entry, async_add_entities):
     """Configura i sensori."""
     coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    outbox = hass.data[DOMAIN][entry.entry_id]["outbox"]
+    client = hass.data[DOMAIN][entry.entry_id]["client"]
     host = entry.data[CONF_HOST]
+    # Contatori scritture eseguite / saltate, esposti nella diagnostica
+    writes = hass.data[DOMAIN][entry.entry_id]["sensor_writes"]
+    heartbeat = entry.data.get(CONF_SENSOR_HEARTBEAT, DEFAULT_SENSOR_HEARTBEAT)
+    deadband = entry.data.get(CONF_SIGNAL_DEADBAND, DEFAULT_SIGNAL_DEADBAND)
 
     # Definiamo i sensori da creare
     sensors = [
-        GammuSignalSensor(coordinator, entry.entry_id, host),
-        GammuNetworkSensor(coordinator, entry.entry_id, host, "NetworkName", "Operator", "mdi:radio-tower"),
-        GammuNetworkSensor(coordinator, entry.entry_id, host, "State", "Network State", "mdi:signal-variant"),
-        GammuNetworkSensor(coordinator, entry.entry_id, host, "NetworkCode", "Network Code", "mdi:numeric"),
+        GammuSignalSensor(coordinator, entry.entry_id, host, writes, heartbeat, deadband),
+        GammuNetworkSensor(coordinator, entry.entry_id, host, writes, heartbeat, "name", "networkname", "Operator", "mdi:radio-tower"),
+        GammuNetworkSensor(coordinator, entry.entry_id, host, writes, heartbeat, "state", "state", "Network State", "mdi:signal-variant"),
+        GammuNetworkSensor(coordinator, entry.entry_id, host, writes, heartbeat, "code", "networkcode", "Network Code", "mdi:numeric"),
+        GammuOutboxQueueSensor(outbox, entry.entry_id, host),
+        GammuOutboxThroughputSensor(outbox, entry.entry_id, host),
+        GammuCircuitBreakerSensor(client, entry.entry_id, host),
+        GammuDedupeCacheSensor(hass.data[DOMAIN][entry.entry_id]["dedupe"], entry.entry_id, host),
     ]
+    watchdog = hass.data[DOMAIN][entry.entry_id]["watchdog"]
+    if watchdog is not None:
+        sensors.append(GammuWatchdogSensor(watchdog, entry.entry_id, host))
+    commands = hass.data[DOMAIN][entry.entry_id]["commands"]
+    if commands is not None:
+        sensors.append(GammuCommandSensor(commands, entry.entry_id, host))
+    sensors.extend(
+        GammuEndpointLatencySensor(client, entry.entry_id, host, endpoint)
+        for endpoint in client.stats.endpoints
+    )
     
-    async_add_entities(sensors, True)
+    # Nessun aggiornamento prima dell'aggiunta: i sensori del coordinatore ripartono dallo stato salvato
+    async_add_entities(sensors)
+
+
+def gammu_device_info(entry_id, host):
+    """Informazioni per raggruppare le entità sotto un unico dispositivo."""
+    return {
+        "identifiers": {(DOMAIN, entry_id)},
+        "name": f"Gammu Gateway ({host})",
+        "manufacturer": "Gammu",
+        "model": "SMS Gateway",
+        "configuration_url": f"http://{host}:5000",
+    }
 
 
 class GammuBaseEntity(CoordinatorEntity):
@@ -32,47 +89,332 @@ class GammuBaseEntity(CoordinatorEntity):
     @property
     def device_info(self):
         """Informazioni per raggruppare i sensori sotto un unico dispositivo."""
-        return {
-            "identifiers": {(DOMAIN, self._entry_id)},
-            "name": f"Gammu Gateway ({self._host})",
-            "manufacturer": "Gammu",
-            "model": "SMS Gateway",
-            "configuration_url": f"http://{self._host}:5000", 
-        }
+        return gammu_device_info(self._entry_id, self._host)
 
 
-class GammuSignalSensor(GammuBaseEntity, SensorEntity):
-    """Sensore intensità segnale."""
+class GammuChangeOnlyEntity(GammuBaseEntity, RestoreSensor):
+    """Sensore del coordinatore che scrive lo stato solo quando cambia davvero.
 
-    def __init__(self, coordinator, entry_id, host):
+    Ad ogni aggiornamento il nuovo valore è confrontato con l'ultimo scritto
+    (non con il precedente, così una deriva lenta viene comunque pubblicata);
+    disponibilità e flag 'stale' forzano sempre la scrittura e, senza
+    variazioni, lo stato viene riscritto al massimo ogni `heartbeat` secondi.
+    Finché il coordinatore non ha dati il sensore mostra l'ultimo valore
+    della sessione precedente, marcato come stale.
+    """
+
+    def __init__(self, coordinator, entry_id, host, writes, heartbeat, unique_id):
         super().__init__(coordinator, entry_id, host)
+        self._attr_unique_id = unique_id
+        self._heartbeat = heartbeat
+        self._writes = writes.setdefault(unique_id, {"written": 0, "skipped": 0})
+        self._last_write = None
+        self._last_available = None
+
+    def _read_value(self):
+        """Valore attuale nei dati del coordinatore."""
+        raise NotImplementedError
+
+    def _read_stale(self):
+        raise NotImplementedError
+
+    def _is_significant(self, old, new):
+        """Ritorna True se il passaggio da old a new va scritto."""
+        return old != new
+
+    async def async_added_to_hass(self):
+        """Parte dai dati del coordinatore o, se non ancora disponibili, dallo stato salvato."""
+        if self.coordinator.data is not None:
+            self._apply()
+        else:
+            last = await self.async_get_last_sensor_data()
+            self._apply(last.native_value if last else None, True)
+        await super().async_added_to_hass()
+
+    @callback
+    def _handle_coordinator_update(self):
+        value = self._read_value()
+        stale = self._read_stale()
+        if stale and value is None:
+            # Nessun dato nuovo: resta l'ultimo valore noto (anche se ripristinato)
+            value = self._attr_native_value
+        if (
+            self.available == self._last_available
+            and stale == self._attr_extra_state_attributes["stale"]
+            and not self._is_significant(self._attr_native_value, value)
+            and time.monotonic() - self._last_write < self._heartbeat
+        ):
+            self._writes["skipped"] += 1
+            return
+        self._apply(value, stale)
+        self._writes["written"] += 1
+        self.async_write_ha_state()
+
+    def _apply(self, value=None, stale=None):
+        if stale is None:
+            value, stale = self._read_value(), self._read_stale()
+        self._attr_native_value = value
+        self._attr_extra_state_attributes = {"stale": stale}
+        self._last_available = self.available
+        self._last_write = time.monotonic()
+
+
+class GammuSignalSensor(GammuChangeOnlyEntity):
+    """Sensore intensità segnale (variazioni sotto `deadband` dBm ignorate)."""
+
+    def __init__(self, coordinator, entry_id, host, writes, heartbeat, deadband):
+        super().__init__(coordinator, entry_id, host, writes, heartbeat, f"{entry_id}_signal_strength")
+        self._deadband = deadband
         self._attr_name = "Signal Strength"
-        self._attr_unique_id = f"{entry_id}_signal_strength"
         self._attr_device_class = SensorDeviceClass.SIGNAL_STRENGTH
         self._attr_native_unit_of_measurement = SIGNAL_STRENGTH_DECIBELS_MILLIWATT
         self._attr_state_class = SensorStateClass.MEASUREMENT
 
-    @property
-    def native_value(self):
-        """Legge il valore dal JSON 'signal'."""
-        # Recupera il dizionario 'signal' dal coordinatore
-        signal_data = self.coordinator.data.get("signal", {})
-        # Chiave tipica Gammu: 'SignalStrength'
-        return signal_data.get("SignalStrength")
+    def _read_value(self):
+        """Legge l'intensità (dBm) dal SignalInfo del coordinatore."""
+        signal = (self.coordinator.data or {}).get("signal")
+        return signal.strength if signal is not None else None
+
+    def _read_stale(self):
+        """Indica se il valore è l'ultimo noto perché /signal è fallito."""
+        if self.coordinator.data is None:
+            return True
+        return self.coordinator.data.get("stale", {}).get("signal", False)
+
+    def _is_significant(self, old, new):
+        if old is None or new is None:
+            return old != new
+        # Il jitter di ±1 dBm è rumore: scriviamo solo oltre la soglia
+        return abs(new - old) >= max(self._deadband, 1)
 
 
-class GammuNetworkSensor(GammuBaseEntity, SensorEntity):
+class GammuNetworkSensor(GammuChangeOnlyEntity):
     """Sensore generico per i dati di rete (Operatore, Stato, ecc)."""
 
-    def __init__(self, coordinator, entry_id, host, json_key, name_suffix, icon):
-        super().__init__(coordinator, entry_id, host)
-        self._json_key = json_key
+    def __init__(self, coordinator, entry_id, host, writes, heartbeat, field, key, name_suffix, icon):
+        # key mantiene gli unique_id creati con le chiavi JSON di /network (es. 'networkname')
+        super().__init__(coordinator, entry_id, host, writes, heartbeat, f"{entry_id}_{key}")
+        self._field = field
         self._attr_name = name_suffix
-        self._attr_unique_id = f"{entry_id}_{json_key.lower()}"
         self._attr_icon = icon
 
+    def _read_value(self):
+        """Legge il campo dal NetworkInfo del coordinatore."""
+        network = (self.coordinator.data or {}).get("network")
+        return getattr(network, self._field) if network is not None else None
+
+    def _read_stale(self):
+        """Indica se il valore è l'ultimo noto perché /network è fallito."""
+        if self.coordinator.data is None:
+            return True
+        return self.coordinator.data.get("stale", {}).get("network", False)
+
+
+class GammuDiagnosticEntity(SensorEntity):
+    """Classe base per i sensori diagnostici non legati al coordinatore."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, entry_id, host):
+        self._entry_id = entry_id
+        self._host = host
+
+    @property
+    def device_info(self):
+        return gammu_device_info(self._entry_id, self._host)
+
+
+class GammuOutboxQueueSensor(GammuDiagnosticEntity):
+    """Sensore numero di SMS in coda di invio."""
+
+    _attr_should_poll = False
+
+    def __init__(self, outbox, entry_id, host):
+        super().__init__(entry_id, host)
+        self._outbox = outbox
+        self._attr_name = "SMS Queue"
+        self._attr_unique_id = f"{entry_id}_outbox_queue"
+        self._attr_icon = "mdi:tray-full"
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+
+    async def async_added_to_hass(self):
+        """Aggiorna lo stato ad ogni variazione della coda."""
+        self.async_on_remove(self._outbox.async_add_listener(self.async_write_ha_state))
+
+    @property
+    def native_value(self):
+        return self._outbox.depth
+
+    @property
+    def extra_state_attributes(self):
+        return {
+            "segments": self._outbox.queued_segments,
+            "sent": self._outbox.sent_count,
+            "failed": self._outbox.failed_count,
+            "segments_sent": self._outbox.segments_sent,
+        }
+
+
+class GammuOutboxThroughputSensor(GammuDiagnosticEntity):
+    """Sensore SMS inviati nell'ultimo minuto (aggiornato a polling)."""
+
+    def __init__(self, outbox, entry_id, host):
+        super().__init__(entry_id, host)
+        self._outbox = outbox
+        self._attr_name = "SMS Throughput"
+        self._attr_unique_id = f"{entry_id}_outbox_throughput"
+        self._attr_icon = "mdi:send-clock"
+        self._attr_native_unit_of_measurement = "SMS/min"
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def native_value(self):
+        return self._outbox.throughput
+
+
+
+class GammuCircuitBreakerSensor(GammuDiagnosticEntity):
+    """Stato del circuit breaker verso il gateway (closed / open / half_open)."""
+
+    _attr_should_poll = False
+
+    def __init__(self, client, entry_id, host):
+        super().__init__(entry_id, host)
+        self._breaker = client.breaker
+        self._client = client
+        self._attr_name = "Gateway Circuit"
+        self._attr_unique_id = f"{entry_id}_circuit_breaker"
+        self._attr_icon = "mdi:electric-switch"
+        self._attr_device_class = SensorDeviceClass.ENUM
+        self._attr_options = [STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN]
+
+    async def async_added_to_hass(self):
+        """Aggiorna lo stato ad ogni transizione del circuito."""
+        self.async_on_remove(self._breaker.add_listener(self.async_write_ha_state))
+
     @property
     def native_value(self):
-        """Legge il valore dal JSON 'network'."""
-        network_data = self.coordinator.data.get("network", {})
-        return network_data.get(self._json_key)
\ No newline at end of file
+        return self._breaker.state
+
+    @property
+    def extra_state_attributes(self):
+        return {
+            "consecutive_failures": self._breaker.consecutive_failures,
+            "open_count": self._breaker.open_count,
+            "timeouts": {
+                endpoint: round(estimator.timeout, 2)
+                for endpoint, estimator in self._client.latency.items()
+            },
+        }
+
+
+
+class GammuEndpointLatencySensor(GammuDiagnosticEntity):
+    """Latenza media di un endpoint del gateway, con contatori come attributi."""
+
+    def __init__(self, client, entry_id, host, endpoint):
+        super().__init__(entry_id, host)
+        self._stats = client.stats.endpoints[endpoint]
+        self._attr_name = f"Latency /{endpoint}"
+        self._attr_unique_id = f"{entry_id}_latency_{endpoint}"
+        self._attr_icon = "mdi:timer-outline"
+        self._attr_device_class = SensorDeviceClass.DURATION
+        self._attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+        self._attr_suggested_display_precision = 0
+
+    @property
+    def native_value(self):
+        mean = self._stats.mean_latency
+        return None if mean is None else round(mean * 1000, 1)
+
+    @property
+    def extra_state_attributes(self):
+        p95 = self._stats.percentile(0.95)
+        return {
+            "calls": self._stats.calls,
+            "errors": dict(self._stats.errors),
+            "bytes_received": self._stats.bytes_received,
+            "p95_ms": None if p95 is None else round(p95 * 1000),
+            "max_ms": round(self._stats.max_latency * 1000),
+        }
+
+
+
+class GammuDedupeCacheSensor(GammuDiagnosticEntity):
+    """Dimensione della cache anti-duplicati, con hit/miss per dimensionarla."""
+
+    def __init__(self, dedupe, entry_id, host):
+        super().__init__(entry_id, host)
+        self._dedupe = dedupe
+        self._attr_name = "SMS Dedupe Cache"
+        self._attr_unique_id = f"{entry_id}_dedupe_cache"
+        self._attr_icon = "mdi:content-duplicate"
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def native_value(self):
+        return len(self._dedupe)
+
+    @property
+    def extra_state_attributes(self):
+        lookups = self._dedupe.hits + self._dedupe.misses
+        return {
+            "hits": self._dedupe.hits,
+            "misses": self._dedupe.misses,
+            "hit_rate": round(self._dedupe.hits / lookups, 3) if lookups else None,
+        }
+
+
+class GammuCommandSensor(GammuDiagnosticEntity):
+    """Comandi SMS riconosciuti, con i contatori di ogni regola."""
+
+    def __init__(self, commands, entry_id, host):
+        super().__init__(entry_id, host)
+        self._commands = commands
+        self._attr_name = "SMS Commands"
+        self._attr_unique_id = f"{entry_id}_sms_commands"
+        self._attr_icon = "mdi:message-cog"
+        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+    @property
+    def native_value(self):
+        return self._commands.matches
+
+    @property
+    def extra_state_attributes(self):
+        attributes = {
+            name: counter["matches"] for name, counter in self._commands.counters.items()
+        }
+        attributes["errors"] = sum(counter["errors"] for counter in self._commands.counters.values())
+        attributes["unmatched"] = self._commands.unmatched
+        return attributes
+
+
+class GammuWatchdogSensor(GammuDiagnosticEntity):
+    """Stato del watchdog del modem, con reset eseguiti e tempi di recupero."""
+
+    def __init__(self, watchdog, entry_id, host):
+        super().__init__(entry_id, host)
+        self._watchdog = watchdog
+        self._attr_name = "Modem Watchdog"
+        self._attr_unique_id = f"{entry_id}_watchdog"
+        self._attr_icon = "mdi:shield-sync"
+        self._attr_device_class = SensorDeviceClass.ENUM
+        self._attr_options = WATCHDOG_STATUSES
+
+    @property
+    def native_value(self):
+        return self._watchdog.status
+
+    @property
+    def extra_state_attributes(self):
+        return {
+            "reasons": self._watchdog.reasons,
+            "resets": self._watchdog.resets,
+            "failed_resets": self._watchdog.failed_resets,
+            "resets_last_hour": self._watchdog.resets_last_hour,
+            "last_reset": self._watchdog.last_reset,
+            "last_recovery_time": self._watchdog.last_recovery_time,
+            "mean_recovery_time": self._watchdog.mean_recovery_time,
+        }
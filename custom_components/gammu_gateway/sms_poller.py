@@ -0,0 +1,118 @@
+"""Polling adattivo della coda /getsms del Gammu Gateway."""
+import logging
+import time
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    SMS_MAX_PER_POLL,
+    SMS_MIN_POLL_INTERVAL,
+    SMS_IDLE_BACKOFF_FACTOR,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class GammuSmsPoller:
+    """Svuota la coda /getsms ad ogni ciclo e adatta l'intervallo al traffico.
+
+    Finché arrivano messaggi l'intervallo scende a SMS_MIN_POLL_INTERVAL;
+    quando il gateway è inattivo raddoppia ad ogni ciclo vuoto fino a
+    scan_interval_sms * SMS_IDLE_BACKOFF_FACTOR.
+    """
+
+    def __init__(self, hass: HomeAssistant, client, base_interval, on_sms):
+        self._hass = hass
+        self._client = client
+        self._on_sms = on_sms
+        self._base_interval = base_interval
+        self._max_interval = base_interval * SMS_IDLE_BACKOFF_FACTOR
+        self._interval = base_interval
+        self._last_received = 0
+        # Istante (monotonic) della prima lettura /getsms vuota di fila, None dopo un SMS (per il watchdog)
+        self.empty_since = None
+        self._unsub = None
+        self._running = False
+
+    @property
+    def interval(self):
+        """Intervallo (secondi) attualmente in uso."""
+        return self._interval
+
+    @property
+    def backlog(self):
+        """True se l'ultimo ciclo ha letto SMS (la coda del gateway si sta svuotando)."""
+        return self._last_received > 0
+
+    @callback
+    def async_start(self, initial_delay=None):
+        """Avvia il polling periodico (il primo ciclo dopo initial_delay secondi)."""
+        self._running = True
+        self._schedule(self._interval if initial_delay is None else initial_delay)
+
+    @callback
+    def async_stop(self):
+        """Ferma il polling e cancella il prossimo ciclo programmato."""
+        self._running = False
+        if self._unsub:
+            self._unsub()
+            self._unsub = None
+
+    def _schedule(self, delay):
+        self._unsub = async_call_later(self._hass, delay, self._async_tick)
+
+    async def _async_tick(self, _now):
+        self._unsub = None
+        received = 0
+        try:
+            received = await self.async_check_sms_messages()
+        finally:
+            # Qualunque errore non deve fermare la ricezione: il prossimo ciclo parte sempre
+            self._last_received = received
+            if self._running:
+                self._interval = self._next_interval(received)
+                self._schedule(self._interval)
+
+    async def async_check_sms_messages(self):
+        """Legge /getsms finché la coda è vuota (max SMS_MAX_PER_POLL letture).
+
+        Ritorna il numero di SMS ricevuti in questo ciclo.
+        """
+        received = 0
+        while received < SMS_MAX_PER_POLL:
+            try:
+                sms = await self._client.get_last_sms()
+            except Exception as err:
+                # Non facciamo crashare tutto se una chiamata fallisce, solo log
+                _LOGGER.warning("Errore durante controllo SMS: %s", err)
+                break
+
+            # Nessun messaggio (risposta senza 'Text'): la coda del gateway è vuota
+            if sms is None:
+                if not received and self.empty_since is None:
+                    self.empty_since = time.monotonic()
+                break
+
+            received += 1
+            self.empty_since = None
+            try:
+                await self._on_sms(sms)
+            except Exception:
+                # L'SMS è già stato tolto dal gateway: lo registriamo e passiamo al successivo
+                _LOGGER.exception("Errore durante l'elaborazione dell'SMS da %s", sms.sender)
+
+        if received:
+            _LOGGER.debug("Letti %d SMS dalla coda del gateway", received)
+        else:
+            _LOGGER.debug("Nessun nuovo SMS.")
+        return received
+
+    def _next_interval(self, received):
+        """Calcola l'attesa prima del prossimo ciclo."""
+        if received >= SMS_MAX_PER_POLL:
+            # Limite raggiunto: la coda probabilmente non è vuota, riprendiamo subito
+            return 1
+        if received:
+            return SMS_MIN_POLL_INTERVAL
+        return min(max(self._interval * 2, SMS_MIN_POLL_INTERVAL), self._max_interval)
@@ -0,0 +1,103 @@
+"""Statistiche per endpoint delle chiamate al Gammu Gateway."""
+import time
+from bisect import bisect_left
+from collections import deque
+
+from .const import SLOW_CALL_THRESHOLD, SLOW_CALL_SAMPLES
+
+# Limiti superiori (secondi) dei bucket dell'istogramma delle latenze
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class EndpointStats:
+    """Contatori e istogramma delle latenze di un singolo endpoint."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = {}
+        self.bytes_received = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_latency = None
+        # L'ultimo bucket raccoglie le chiamate oltre LATENCY_BUCKETS[-1]
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    @property
+    def mean_latency(self):
+        if not self.calls:
+            return None
+        return self.total_latency / self.calls
+
+    def percentile(self, fraction):
+        """Percentile approssimato: limite superiore del bucket che lo contiene."""
+        if not self.calls:
+            return None
+        target = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target:
+                if index < len(LATENCY_BUCKETS):
+                    return LATENCY_BUCKETS[index]
+                return self.max_latency
+        return self.max_latency
+
+    def record(self, latency, status, nbytes):
+        self.calls += 1
+        self.bytes_received += nbytes
+        self.total_latency += latency
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        if status != 200:
+            self.record_error(status)
+
+    def record_error(self, status):
+        key = str(status)
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": dict(self.errors),
+            "bytes_received": self.bytes_received,
+            "mean_latency": self.mean_latency,
+            "p50_latency": self.percentile(0.5),
+            "p95_latency": self.percentile(0.95),
+            "max_latency": self.max_latency,
+            "histogram": dict(
+                zip([f"<={bound}" for bound in LATENCY_BUCKETS] + ["inf"], self.histogram)
+            ),
+        }
+
+
+class GatewayStats:
+    """Statistiche di tutti gli endpoint di un gateway più le chiamate lente recenti."""
+
+    def __init__(self, endpoints):
+        self.endpoints = {endpoint: EndpointStats() for endpoint in endpoints}
+        self.slow_calls = deque(maxlen=SLOW_CALL_SAMPLES)
+
+    def record(self, endpoint, method, latency, status, nbytes=0):
+        """Registra una chiamata conclusa (status HTTP o 'timeout' / 'connection')."""
+        self.endpoints[endpoint].record(latency, status, nbytes)
+        if latency >= SLOW_CALL_THRESHOLD:
+            self.slow_calls.append({
+                "time": time.time(),
+                "endpoint": endpoint,
+                "method": method,
+                "latency": round(latency, 3),
+                "status": status,
+            })
+
+    def record_rejected(self, endpoint):
+        """Registra una chiamata rifiutata dal circuit breaker."""
+        self.endpoints[endpoint].record_error("circuit_open")
+
+    def as_dict(self):
+        return {
+            "endpoints": {
+                endpoint: stats.as_dict() for endpoint, stats in self.endpoints.items()
+            },
+            "slow_calls": list(self.slow_calls),
+        }
@@ -0,0 +1,226 @@
+"""Watchdog del modem: reset automatico quando il gateway smette di funzionare."""
+import logging
+import time
+from collections import deque
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.util import dt as dt_util
+
+from .api import GammuGatewayApiError
+from .const import (
+    EVENT_GAMMU_MODEM_RESET,
+    WATCHDOG_INTERVAL,
+    WATCHDOG_FAILURE_THRESHOLD,
+    WATCHDOG_LATENCY_FACTOR,
+    WATCHDOG_LATENCY_FLOOR,
+    WATCHDOG_NETWORK_GRACE,
+    WATCHDOG_SEND_FAILURES,
+    WATCHDOG_SEND_WINDOW,
+    WATCHDOG_COOLDOWN,
+    WATCHDOG_MAX_RESETS_PER_HOUR,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+REASON_FAILURES = "consecutive_failures"
+REASON_LATENCY = "latency"
+REASON_NETWORK = "network_lost"
+REASON_SEND_STALL = "send_stall"
+
+STATUS_OK = "ok"
+STATUS_DEGRADED = "degraded"
+STATUS_RECOVERING = "recovering"
+STATUS_LIMITED = "limited"
+STATUSES = [STATUS_OK, STATUS_DEGRADED, STATUS_RECOVERING, STATUS_LIMITED]
+
+# Endpoint di cui sorvegliamo la latenza e peso della media di riferimento
+LATENCY_ENDPOINTS = ("signal", "network", "getsms")
+BASELINE_ALPHA = 0.05
+
+
+class GammuWatchdog:
+    """Controlla periodicamente la salute del gateway e resetta il modem se bloccato.
+
+    Un problema è rilevato con: errori consecutivi verso il gateway, latenza
+    molto sopra la media abituale, modem non registrato in rete per più di
+    WATCHDOG_NETWORK_GRACE secondi, oppure almeno WATCHDOG_SEND_FAILURES
+    invii falliti negli ultimi WATCHDOG_SEND_WINDOW secondi mentre /getsms,
+    da quando sono iniziati gli errori, risponde sempre vuoto. Tra due
+    reset passano almeno WATCHDOG_COOLDOWN secondi e non si superano
+    WATCHDOG_MAX_RESETS_PER_HOUR reset l'ora.
+    Il tempo dalla rilevazione al ritorno alla normalità viene misurato.
+    """
+
+    def __init__(self, hass: HomeAssistant, client, coordinator, outbox, gateway):
+        self._hass = hass
+        self._client = client
+        self._coordinator = coordinator
+        self._outbox = outbox
+        self._gateway = gateway
+        self._poller = None
+        self._unsub = None
+        self._baseline = {}
+        self._network_lost_since = None
+        self._problem_since = None
+        self._last_reset = None
+        self._reset_failed = False
+        self._reset_times = deque()
+        self.status = STATUS_OK
+        self.reasons = []
+        self.resets = 0
+        self.failed_resets = 0
+        self.reset_reasons = {}
+        self.last_reset = None
+        self.recoveries = 0
+        self.last_recovery_time = None
+        self.max_recovery_time = None
+        self._total_recovery_time = 0.0
+
+    @callback
+    def async_start(self, poller=None):
+        """Avvia i controlli periodici."""
+        self._poller = poller
+        self._unsub = async_track_time_interval(self._hass, self._async_check, WATCHDOG_INTERVAL)
+
+    @callback
+    def async_stop(self):
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+
+    @property
+    def resets_last_hour(self):
+        self._prune_reset_times()
+        return len(self._reset_times)
+
+    @property
+    def mean_recovery_time(self):
+        if not self.recoveries:
+            return None
+        return round(self._total_recovery_time / self.recoveries, 1)
+
+    async def _async_check(self, _now=None):
+        now = time.monotonic()
+        reasons = self._detect(now)
+        self.reasons = reasons
+
+        if not reasons:
+            if self._problem_since is not None:
+                self._record_recovery(now)
+            self.status = STATUS_OK
+            return
+
+        if self._problem_since is None:
+            self._problem_since = now
+            _LOGGER.warning("Gateway %s non in salute: %s", self._gateway, ", ".join(reasons))
+
+        if self._last_reset is not None and now - self._last_reset < WATCHDOG_COOLDOWN:
+            # Reset recente: diamo al modem il tempo di ripartire (degradato se il reset è fallito)
+            self.status = STATUS_DEGRADED if self._reset_failed else STATUS_RECOVERING
+            return
+        if self.resets_last_hour >= WATCHDOG_MAX_RESETS_PER_HOUR:
+            self.status = STATUS_LIMITED
+            return
+
+        await self._async_reset(now, reasons)
+
+    def _detect(self, now):
+        """Ritorna le cause di malfunzionamento rilevate in questo controllo."""
+        reasons = []
+
+        if self._client.breaker.consecutive_failures >= WATCHDOG_FAILURE_THRESHOLD:
+            reasons.append(REASON_FAILURES)
+
+        # Latenza: confronto tra la media mobile (srtt) e il riferimento degli ultimi periodi sani
+        for endpoint in LATENCY_ENDPOINTS:
+            srtt = self._client.latency[endpoint].srtt
+            if srtt is None:
+                continue
+            baseline = self._baseline.get(endpoint)
+            if baseline is not None and srtt > max(baseline * WATCHDOG_LATENCY_FACTOR, WATCHDOG_LATENCY_FLOOR):
+                if REASON_LATENCY not in reasons:
+                    reasons.append(REASON_LATENCY)
+                continue
+            self._baseline[endpoint] = (
+                srtt if baseline is None else (1 - BASELINE_ALPHA) * baseline + BASELINE_ALPHA * srtt
+            )
+
+        # Registrazione di rete: solo con un dato fresco del coordinatore
+        data = self._coordinator.data if self._coordinator.last_update_success else None
+        network = (data or {}).get("network")
+        if network is not None and network.state is not None:
+            if network.registered:
+                self._network_lost_since = None
+            else:
+                if self._network_lost_since is None:
+                    self._network_lost_since = now
+                if now - self._network_lost_since >= WATCHDOG_NETWORK_GRACE:
+                    reasons.append(REASON_NETWORK)
+
+        # Invii che falliscono mentre /getsms risponde ma resta vuoto: modem bloccato.
+        # Le letture vuote contano solo se la serie è iniziata dopo il primo errore di invio
+        errors = self._outbox.recent_errors(WATCHDOG_SEND_WINDOW)
+        empty_since = self._poller.empty_since if self._poller is not None else None
+        if (
+            len(errors) >= WATCHDOG_SEND_FAILURES
+            and empty_since is not None
+            and empty_since >= errors[0]
+        ):
+            reasons.append(REASON_SEND_STALL)
+
+        return reasons
+
+    async def _async_reset(self, now, reasons):
+        _LOGGER.warning("Reset automatico del modem %s (%s)", self._gateway, ", ".join(reasons))
+        try:
+            # Quando il watchdog interviene il circuito è di solito già aperto: il reset lo scavalca
+            await self._client.reset_modem(bypass_breaker=True)
+        except GammuGatewayApiError as err:
+            self.failed_resets += 1
+            self._reset_failed = True
+            _LOGGER.error("Reset automatico del modem %s fallito: %s", self._gateway, err)
+        else:
+            self.resets += 1
+            self._reset_failed = False
+            for reason in reasons:
+                self.reset_reasons[reason] = self.reset_reasons.get(reason, 0) + 1
+
+        # Anche un reset fallito consuma cooldown e quota oraria: non insistiamo sul modem
+        self._last_reset = now
+        self._reset_times.append(now)
+        self.last_reset = dt_util.utcnow().isoformat()
+        self.status = STATUS_DEGRADED if self._reset_failed else STATUS_RECOVERING
+        self._hass.bus.async_fire(EVENT_GAMMU_MODEM_RESET, {
+            "gateway": self._gateway,
+            "reasons": reasons,
+        })
+
+    def _record_recovery(self, now):
+        recovery = now - self._problem_since
+        self._problem_since = None
+        self.recoveries += 1
+        self.last_recovery_time = round(recovery, 1)
+        self.max_recovery_time = max(self.max_recovery_time or 0, self.last_recovery_time)
+        self._total_recovery_time += recovery
+        _LOGGER.info("Gateway %s di nuovo in salute dopo %.0fs", self._gateway, recovery)
+
+    def _prune_reset_times(self):
+        cutoff = time.monotonic() - 3600
+        while self._reset_times and self._reset_times[0] < cutoff:
+            self._reset_times.popleft()
+
+    def as_dict(self):
+        return {
+            "status": self.status,
+            "reasons": self.reasons,
+            "resets": self.resets,
+            "failed_resets": self.failed_resets,
+            "resets_last_hour": self.resets_last_hour,
+            "reset_reasons": self.reset_reasons,
+            "last_reset": self.last_reset,
+            "recoveries": self.recoveries,
+            "last_recovery_time": self.last_recovery_time,
+            "mean_recovery_time": self.mean_recovery_time,
+            "max_recovery_time": self.max_recovery_time,
+        }